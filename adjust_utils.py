@@ -0,0 +1,59 @@
+from frame_cache import market_cache, slice_from
+from local_store import (
+    get_store_conn,
+    load_symbol_bars,
+    get_symbol_bar_version,
+    expected_latest_trade_date,
+)
+
+# ===================== 本地复权计算 =====================
+# 日线与复权因子均按交易日批量落盘，复权价在本地向量化计算，不再逐只调用 pro_bar。
+# 前复权以最新因子为基准：price * adj / adj_latest；后复权：price * adj。
+# 复权结果存入 frame_cache.market_cache，键中带 (最新K线日期, 最新因子) 版本，出现新除权日只会让对应标的失效重算。
+
+PRICE_COLS = ['open', 'high', 'low', 'close', 'pre_close']
+
+def adjust_prices(bars, how='qfq'):
+    """
+    bars: 含 PRICE_COLS 与 adj_factor 列，按 trade_date 升序
+    how: 'qfq' 前复权 / 'hfq' 后复权 / None 不复权
+    停牌等缺失因子的交易日沿用前值
+    """
+    if how is None or bars.empty: return bars
+    factor = bars['adj_factor'].ffill().bfill()
+    if how == 'qfq':
+        ratio = factor / factor.iloc[-1]
+    elif how == 'hfq':
+        ratio = factor
+    else:
+        raise ValueError(f"未知复权方式: {how}")
+    out = bars.copy()
+    cols = [c for c in PRICE_COLS if c in out.columns]
+    out[cols] = out[cols].mul(ratio, axis=0)
+    return out
+
+def get_adjusted_bars(ts_code, start_date=None, how='qfq', conn=None, require_fresh=True):
+    """
+    从本地库读取复权日线；库中没有该标的或数据不新鲜时返回 None (由调用方走远程接口)
+    """
+    if ts_code.endswith('.HK'): return None
+    own = conn is None
+    try:
+        if own: conn = get_store_conn(readonly=True)
+        if conn is None: return None
+        version = get_symbol_bar_version(conn, ts_code)
+        last_date, last_factor = version
+        if last_date is None or last_factor is None: return None
+        if require_fresh and last_date < expected_latest_trade_date(conn=conn): return None
+
+        key = ("adjusted", ts_code, how, version)
+        df = market_cache.get(key)
+        if df is None: df = market_cache.put(key, adjust_prices(load_symbol_bars(conn, ts_code), how))
+
+        if start_date: df = slice_from(df, start_date)
+        return df.reset_index(drop=True)
+    except Exception as e:
+        print(f"Adjusted Bars Error: {e}")
+        return None
+    finally:
+        if own and conn is not None: conn.close()
@@ -0,0 +1,266 @@
+import asyncio
+import contextlib
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from aiohttp import web
+
+from data_utils import (
+    validate_stock_code,
+    get_stock_name_by_code,
+    search_stocks,
+    get_clean_market_data,
+    get_clean_fundamental_data,
+    get_market_environment_data,
+    get_market_history,
+)
+from frame_cache import get_market_cache_stats
+from chart_utils import CHART_RANGES, CHART_MAX_POINTS, prepare_chart_data, to_chart_payload
+from core_logic import (
+    STYLES,
+    CYCLES,
+    generate_analysis_prompt,
+    generate_comparison_prompt,
+    min_comparison_budget,
+    COMPARE_TOKEN_BUDGET,
+    acall_deepseek_api,
+    astream_deepseek_api,
+)
+
+# ===================== 异步 JSON API 服务 =====================
+# Tushare SDK 是同步的，放进有界线程池执行；模型调用走共享的 AsyncOpenAI 连接池。
+# 并发上限：
+#   API_MAX_INFLIGHT     同时处理的请求数，超过直接 503，防止排队雪崩
+#   API_DATA_WORKERS     取数线程数 (同时在途的 Tushare 请求)
+#   API_LLM_CONCURRENCY  同时在途的模型请求数
+
+MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "512"))
+DATA_WORKERS = int(os.getenv("API_DATA_WORKERS", "32"))
+LLM_CONCURRENCY = int(os.getenv("API_LLM_CONCURRENCY", "64"))
+
+def _error(status, msg):
+    return web.json_response({"错误": msg}, status=status, dumps=functools.partial(json.dumps, ensure_ascii=False))
+
+def _json(data):
+    return web.json_response(data, dumps=functools.partial(json.dumps, ensure_ascii=False))
+
+@web.middleware
+async def limit_inflight(request, handler):
+    app = request.app
+    if app["inflight"] >= MAX_INFLIGHT: return _error(503, "服务繁忙，请稍后重试")
+    app["inflight"] += 1
+    try:
+        return await handler(request)
+    finally:
+        app["inflight"] -= 1
+
+async def run_blocking(request, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app["executor"], functools.partial(func, *args))
+
+async def collect_stock_data(request, code, envs=None):
+    """
+    并发拉取行情 / 名称 / 市场环境，基本面复用行情里的指标缓存
+    envs: 批量时传入共享 dict，同一市场 (A股 / 港股) 的市场环境只取一次
+    """
+    is_valid, ts_code = validate_stock_code(code)
+    if not is_valid: return None, ts_code
+
+    if envs is None: env_task = run_blocking(request, get_market_environment_data, ts_code)
+    else:
+        hk = ts_code.endswith('.HK')
+        if hk not in envs: envs[hk] = asyncio.ensure_future(run_blocking(request, get_market_environment_data, ts_code))
+        env_task = envs[hk]
+    daily_data, stock_name, mkt_data = await asyncio.gather(
+        run_blocking(request, get_clean_market_data, ts_code),
+        run_blocking(request, get_stock_name_by_code, ts_code),
+        env_task,
+    )
+    if "错误" in daily_data: return None, daily_data["错误"]
+    fund_data = await run_blocking(request, get_clean_fundamental_data, ts_code, daily_data)
+    return {
+        "代码": ts_code, "名称": stock_name,
+        "行情": {k: v for k, v in daily_data.items() if not k.startswith('_')},
+        "基本面": fund_data,
+        "市场环境": mkt_data,
+        "_daily": daily_data,
+    }, None
+
+async def _report_params(request):
+    try:
+        body = await request.json() if request.can_read_body else {}
+    except json.JSONDecodeError:
+        return None, "请求体不是合法 JSON"
+    if not isinstance(body, dict): return None, "请求体必须是 JSON 对象"
+    code = body.get("code") or request.query.get("code")
+    style = body.get("style", STYLES[0])
+    cycle = body.get("cycle", CYCLES[0])
+    if not code or not isinstance(code, str): return None, "缺少参数 code"
+    if style not in STYLES: return None, f"style 取值: {STYLES}"
+    if cycle not in CYCLES: return None, f"cycle 取值: {CYCLES}"
+    return (code, style, cycle), None
+
+def _build_prompt(data, style, cycle):
+    return generate_analysis_prompt(
+        data["代码"], data["名称"], cycle,
+        data["_daily"], data["基本面"], data["市场环境"],
+        style=style
+    )
+
+# ===================== 路由 =====================
+
+async def handle_health(request):
+    return _json({"status": "ok", "inflight": request.app["inflight"]})
+
+async def handle_cache_stats(request):
+    return _json(get_market_cache_stats())
+
+async def handle_search(request):
+    keyword = request.query.get("q", "").strip()
+    if not keyword: return _error(400, "缺少参数 q")
+    return _json(await run_blocking(request, search_stocks, keyword))
+
+async def handle_quote(request):
+    code = request.query.get("code", "")
+    data, err = await collect_stock_data(request, code)
+    if err: return _error(400, err)
+    data.pop("_daily")
+    return _json(data)
+
+async def handle_kline(request):
+    """?code=600519&range=5年&points=400 -> 降采样后的列式 OHLC + 指标"""
+    is_valid, ts_code = validate_stock_code(request.query.get("code", ""))
+    if not is_valid: return _error(400, ts_code)
+    range_key = request.query.get("range", "1年")
+    if range_key not in CHART_RANGES: return _error(400, f"range 取值: {list(CHART_RANGES)}")
+    try:
+        points = min(max(int(request.query.get("points", CHART_MAX_POINTS)), 50), 2000)
+    except ValueError:
+        return _error(400, "points 必须为整数")
+
+    hist = await run_blocking(request, get_market_history, ts_code)
+    if hist is None or hist.empty: return _error(404, "暂无历史行情数据")
+    data, k = prepare_chart_data(hist, range_key, points)
+    return _json({"代码": ts_code, "区间": range_key, "合并天数": k, "数据": to_chart_payload(data)})
+
+async def handle_report(request):
+    params, err = await _report_params(request)
+    if err: return _error(400, err)
+    code, style, cycle = params
+
+    data, err = await collect_stock_data(request, code)
+    if err: return _error(400, err)
+    async with request.app["llm_sem"]:
+        report = await acall_deepseek_api(_build_prompt(data, style, cycle))
+    data.pop("_daily")
+    data.update({"风格": style, "周期": cycle, "分析时间": datetime.now().strftime('%Y-%m-%d %H:%M'), "AI分析报告": report})
+    return _json(data)
+
+async def handle_report_stream(request):
+    """
+    Server-Sent Events：
+      event: data   完整的行情 / 基本面 / 市场环境 JSON
+      event: delta  模型输出片段 (逐段推送)
+      event: done   结束
+    """
+    params, err = await _report_params(request)
+    if err: return _error(400, err)
+    code, style, cycle = params
+
+    data, err = await collect_stock_data(request, code)
+    if err: return _error(400, err)
+    prompt = _build_prompt(data, style, cycle)
+    data.pop("_daily")
+
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream; charset=utf-8", "Cache-Control": "no-cache"})
+    await resp.prepare(request)
+
+    async def send(event, payload):
+        await resp.write(f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+    try:
+        await send("data", data)
+        # 客户端断开时 send 会抛错：aclosing 立即关闭生成器，取消上游模型请求，不等垃圾回收
+        async with request.app["llm_sem"], contextlib.aclosing(astream_deepseek_api(prompt)) as pieces:
+            async for piece in pieces:
+                await send("delta", piece)
+        await send("done", {})
+        await resp.write_eof()
+    except ConnectionResetError:
+        pass
+    return resp
+
+async def handle_compare(request):
+    """{"codes": [...], "style", "cycle", "budget"} -> 多股数据 + 一次模型调用的横向对比报告"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return _error(400, "请求体不是合法 JSON")
+    if not isinstance(body, dict): return _error(400, "请求体必须是 JSON 对象")
+    codes = body.get("codes") or []
+    style = body.get("style", STYLES[0])
+    cycle = body.get("cycle", CYCLES[0])
+    if not isinstance(codes, list) or len(codes) < 2 or not all(isinstance(c, str) for c in codes): return _error(400, "codes 须为至少 2 个股票代码的字符串数组")
+    if style not in STYLES: return _error(400, f"style 取值: {STYLES}")
+    if cycle not in CYCLES: return _error(400, f"cycle 取值: {CYCLES}")
+    try:
+        budget = int(body.get("budget", COMPARE_TOKEN_BUDGET))
+    except (TypeError, ValueError):
+        return _error(400, "budget 必须为整数")
+    need = min_comparison_budget(cycle, style)
+    if budget < need: return _error(400, f"budget 过小，至少需要 {need}")
+
+    envs = {}
+    collected = await asyncio.gather(*(collect_stock_data(request, c, envs) for c in codes))
+    items, errors = [], {}
+    for code, (data, err) in zip(codes, collected):
+        if err: errors[code] = err
+        elif all(it["代码"] != data["代码"] for it in items): items.append(data)
+    if len(items) < 2: return _error(400, f"有效标的不足 2 只: {errors}")
+
+    try:
+        prompt, packed = generate_comparison_prompt(items, cycle, style=style, token_budget=budget)
+    except ValueError as e:
+        return _error(400, str(e))
+    async with request.app["llm_sem"]:
+        report = await acall_deepseek_api(prompt)
+    for it in items: it.pop("_daily")
+    return _json({
+        "风格": style, "周期": cycle, "分析时间": datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "标的": items, "未纳入": packed["omitted"], "错误": errors, "AI对比报告": report
+    })
+
+# ===================== 启动 =====================
+
+async def _on_startup(app):
+    app["executor"] = ThreadPoolExecutor(max_workers=DATA_WORKERS, thread_name_prefix="tushare")
+    app["llm_sem"] = asyncio.Semaphore(LLM_CONCURRENCY)
+
+async def _on_cleanup(app):
+    app["executor"].shutdown(wait=False, cancel_futures=True)
+
+def create_app():
+    app = web.Application(middlewares=[limit_inflight])
+    app["inflight"] = 0
+    app.router.add_get("/api/health", handle_health)
+    app.router.add_get("/api/cache/stats", handle_cache_stats)
+    app.router.add_get("/api/search", handle_search)
+    app.router.add_get("/api/quote", handle_quote)
+    app.router.add_get("/api/kline", handle_kline)
+    app.router.add_post("/api/report", handle_report)
+    app.router.add_post("/api/report/stream", handle_report_stream)
+    app.router.add_post("/api/compare", handle_compare)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="DeepSeek 智能投研 - JSON API 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -11,9 +11,13 @@ from data_utils import (
     search_stocks, 
     get_clean_market_data, 
     get_clean_fundamental_data, 
-    get_market_environment_data
+    get_market_environment_data,
+    get_market_history
 )
-from core_logic import call_deepseek_api, generate_analysis_prompt
+from core_logic import call_deepseek_api, generate_analysis_prompt, STYLES, CYCLES
+from pipeline import compare_stocks
+from chart_utils import CHART_RANGES, prepare_chart_data, build_kline_figure
+from frame_cache import get_market_cache_stats
 
 # ===================== 1. 页面基础配置 =====================
 st.set_page_config(
@@ -272,6 +276,48 @@ def run_app():
         st.markdown("<br><br>", unsafe_allow_html=True)
         st.markdown("<div style='text-align:center; color:#ccc; font-size:0.8rem;'>Powered by DeepSeek & Tushare Pro</div>", unsafe_allow_html=True)
 
+    @st.fragment
+    def render_kline(ts_code):
+        """K线图：切换区间只重跑本片段，数据在服务端按区间降采样"""
+        st.markdown("### 🕯 K线走势")
+        range_key = st.radio("区间", list(CHART_RANGES), index=1, horizontal=True, label_visibility="collapsed", key="kline_range")
+        hist = get_market_history(ts_code)
+        if hist is None or hist.empty:
+            st.info("暂无历史行情数据")
+            return
+        data, k = prepare_chart_data(hist, range_key)
+        st.plotly_chart(build_kline_figure(data), config={"displaylogo": False})
+        if k > 1: st.caption(f"长周期已按每 {k} 个交易日合并为一根K线显示 (共 {len(data)} 根)")
+
+    def show_comparison(codes, analysis_style, predict_cycle):
+        """多股横向对比：一次模型调用生成排名报告"""
+        with st.status(f"🔄 正在对比 {len(codes)} 只标的...", expanded=True) as status:
+            res = compare_stocks(codes, style=analysis_style, predict_cycle=predict_cycle)
+            status.update(label="✅ 对比分析完成", state="complete")
+
+        for code, err in res["错误"].items(): st.warning(f"{code}: {err}")
+        if res["标的"]:
+            st.markdown("### 🆚 多股横向对比")
+            rows = [dict({"代码": it["代码"], "名称": it["名称"]}, **it["行情"], **it["基本面"]) for it in res["标的"]]
+            cols = ["代码", "名称", "收盘价", "涨跌幅", "换手率", "RSI", "MACD", "PE(TTM)", "PB", "PE分位(5年)", "总市值", "所属行业", "PE行业排名"]
+            st.dataframe(pd.DataFrame(rows).reindex(columns=cols), width="stretch", hide_index=True)
+        if res["未纳入"]: st.info(f"超出 Prompt 预算未纳入对比: {', '.join(res['未纳入'])}")
+
+        report = res["AI对比报告"] or ""
+        st.markdown(f"""
+        <div class="ai-box">
+            <div style="display:flex; align-items:center; gap:15px; margin-bottom:2rem; padding-bottom:1.5rem; border-bottom:1px solid #eee;">
+                <span style="font-size: 2.2rem;">🆚</span>
+                <div>
+                    <h3 style="margin:0; color:#1e3c72;">DeepSeek 横向对比报告</h3>
+                    <span style="font-size:0.9rem; color:#888;">AI 扮演角色：{analysis_style}分析师 | 周期：{predict_cycle}</span>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        if report.startswith("❌"): st.error(report)
+        else: st.markdown(report)
+        st.markdown("</div>", unsafe_allow_html=True)
+
     # ===================== 业务逻辑 =====================
 
     if not get_tushare_pro():
@@ -319,17 +365,29 @@ def run_app():
         
         analysis_style = st.select_slider(
             "AI 分析风格",
-            options=["稳健理智", "短线博弈", "激进犀利"],
+            options=STYLES,
             value="稳健理智",
             help="稳健：适合价值投资；激进：适合游资/超短线，观点更鲜明。"
         )
         
-        predict_cycle = st.selectbox("周期", ["次日波动", "本周趋势", "月度展望"])
+        predict_cycle = st.selectbox("周期", CYCLES)
         st.markdown("<br>", unsafe_allow_html=True)
         analyze_btn = st.button("🚀 生成投研报告", type="primary")
 
+        st.markdown("---")
+        st.markdown("### 🆚 多股对比")
+        compare_input = st.text_input("对比代码", placeholder="如: 600519, 000858, 000568")
+        compare_codes = [c for c in compare_input.replace('，', ',').replace(',', ' ').split() if c]
+        compare_btn = st.button("📊 生成对比报告", disabled=len(compare_codes) < 2)
+
+        cs = get_market_cache_stats()
+        st.caption(f"行情缓存: {cs['entries']} 项 / {cs['bytes'] / 1048576:.1f} MB (上限 {cs['max_bytes'] / 1048576:.0f} MB)，"
+                   f"命中率 {cs['hit_rate']:.0%}，淘汰 {cs['evictions']}")
+
     # --- 主视图 ---
-    if not analyze_btn or not stock_code:
+    if compare_btn:
+        show_comparison(compare_codes, analysis_style, predict_cycle)
+    elif not analyze_btn or not stock_code:
         # 如果没有触发分析，默认显示首页
         show_landing_page()
     else:
@@ -375,7 +433,9 @@ def run_app():
             "最新价": daily_data.get('收盘价'), "涨跌幅": daily_data.get('涨跌幅'),
             "成交量": daily_data.get('成交量'), "换手率": daily_data.get('换手率'),
             "PE(TTM)": fund_data.get('PE(TTM)'), "PB": fund_data.get('PB'),
+            "PE分位": fund_data.get('PE分位'), "PB分位": fund_data.get('PB分位'),
             "总市值": fund_data.get('总市值'), "行业": fund_data.get('所属行业'),
+            "PE行业排名": fund_data.get('PE行业排名'), "涨幅行业排名": fund_data.get('涨幅行业排名'),
             "市场情绪": mkt_data.get('市场情绪'), "指数涨跌": mkt_data.get('市场指数涨跌幅'),
             "AI分析报告": analysis_res
         }
@@ -402,11 +462,13 @@ def run_app():
 
         with c1: render_data_card("Close", "最新收盘", daily_data.get('收盘价'), pchg, trend)
         with c2: render_data_card("Volume", "成交量", daily_data.get('成交量'), f"换手: {daily_data.get('换手率')}")
-        with c3: render_data_card("PE (TTM)", "滚动市盈率", fund_data.get('PE(TTM)'), f"PB: {fund_data.get('PB')}")
+        with c3: render_data_card("PE (TTM)", "滚动市盈率", fund_data.get('PE(TTM)'), f"PB: {fund_data.get('PB')} | 5年分位: {fund_data.get('PE分位(5年)', 'N/A')}")
         with c4: render_data_card("Volatility", "年化波动率", daily_data.get('波动率'), "20日标准差")
 
         st.markdown("<br>", unsafe_allow_html=True)
 
+        render_kline(stock_code)
+
         # 5. 详细指标面板
         col_tech, col_market = st.columns([2, 1], gap="large")
         
@@ -469,10 +531,34 @@ def run_app():
                     <span style="color:#888;">所属行业</span>
                     <span style="font-weight:600;">{fund_data.get('所属行业')}</span>
                 </div>
-                <div style="display:flex; justify-content:space-between;">
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
                     <span style="color:#888;">总市值</span>
                     <span style="font-weight:600;">{fund_data.get('总市值')}</span>
                 </div>
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
+                    <span style="color:#888;">PE 5年分位</span>
+                    <span style="font-weight:600;">{fund_data.get('PE分位(5年)')}</span>
+                </div>
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
+                    <span style="color:#888;">PB 5年分位</span>
+                    <span style="font-weight:600;">{fund_data.get('PB分位(5年)')}</span>
+                </div>
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
+                    <span style="color:#888;">行业PE 5年分位</span>
+                    <span style="font-weight:600;">{fund_data.get('行业PE分位(5年)')}</span>
+                </div>
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
+                    <span style="color:#888;">行业PE中位数</span>
+                    <span style="font-weight:600;">{fund_data.get('行业PE中位数')}</span>
+                </div>
+                <div style="display:flex; justify-content:space-between; margin-bottom:8px;">
+                    <span style="color:#888;">PE行业排名 (低→高)</span>
+                    <span style="font-weight:600;">{fund_data.get('PE行业排名')}</span>
+                </div>
+                <div style="display:flex; justify-content:space-between;">
+                    <span style="color:#888;">涨幅行业排名</span>
+                    <span style="font-weight:600;">{fund_data.get('涨幅行业排名')}</span>
+                </div>
             </div>
             """, unsafe_allow_html=True)
 
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from frame_cache import slice_from
+
+# ===================== K线图 (服务端降采样) =====================
+# 指标在完整日线上计算，再按缩放级别把 K 线合并成不超过 max_points 根 (OHLC 分桶)，
+# 浏览器端的数据量与渲染时间与历史长度无关。
+
+CHART_RANGES = {"3月": 90, "1年": 365, "3年": 365 * 3, "5年": 365 * 5, "10年": 365 * 10, "全部": None}
+CHART_MAX_POINTS = 400
+
+OVERLAY_COLS = ['ma5', 'ma10', 'ma20', 'bb_up', 'bb_mid', 'bb_low', 'dif', 'dea', 'macd', 'rsi']
+
+def slice_range(df, range_key):
+    days = CHART_RANGES.get(range_key)
+    if days is None or df.empty: return df
+    return slice_from(df, (datetime.now() - timedelta(days=days)).strftime('%Y%m%d'))
+
+def downsample_ohlc(df, max_points=CHART_MAX_POINTS):
+    """
+    连续 k 根日线合并为一根：开=首根开盘，高=最高，低=最低，收=末根收盘，量=求和；
+    日期与指标取桶内最后一根 (指标已在完整数据上算好，取末值即该时点的真实值)
+    df 需按 trade_date 升序
+    """
+    n = len(df)
+    if n <= max_points: return df.reset_index(drop=True), 1
+    k = int(np.ceil(n / max_points))
+    starts = np.arange(0, n, k)
+    ends = np.minimum(starts + k, n) - 1
+
+    out = df.iloc[ends].reset_index(drop=True)
+    out['open'] = df['open'].to_numpy()[starts]
+    out['high'] = np.fmax.reduceat(df['high'].to_numpy(dtype=float), starts)
+    out['low'] = np.fmin.reduceat(df['low'].to_numpy(dtype=float), starts)
+    if 'vol' in df.columns:
+        out['vol'] = np.add.reduceat(np.nan_to_num(df['vol'].to_numpy(dtype=float)), starts)
+    return out, k
+
+def prepare_chart_data(df, range_key="1年", max_points=CHART_MAX_POINTS):
+    """按缩放级别截取 + 降采样，返回 (精简后的 DataFrame, 每根K线代表的交易日数)"""
+    cols = ['trade_date', 'open', 'high', 'low', 'close', 'vol'] + [c for c in OVERLAY_COLS if c in df.columns]
+    data = slice_range(df, range_key)[[c for c in cols if c in df.columns]]
+    data, k = downsample_ohlc(data, max_points)
+    num = data.columns.drop('trade_date')
+    data[num] = data[num].astype(float).round(3)
+    # 缓存中的 trade_date 为 int32，对外统一为 'YYYYMMDD' 字符串
+    data['trade_date'] = data['trade_date'].astype(str)
+    return data, k
+
+def to_chart_payload(data):
+    """供 API 返回的紧凑列式 JSON (NaN -> None)"""
+    return {c: [None if isinstance(v, float) and np.isnan(v) else v for v in data[c].tolist()] for c in data.columns}
+
+def build_kline_figure(data, title=""):
+    """K线 + MA/布林 叠加，MACD、RSI 两个副图"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    x = pd.to_datetime(data['trade_date'].astype(str), format='%Y%m%d').dt.strftime('%Y-%m-%d')
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.6, 0.22, 0.18])
+
+    fig.add_trace(go.Candlestick(
+        x=x, open=data['open'], high=data['high'], low=data['low'], close=data['close'], name="K线",
+        increasing_line_color='#d93025', increasing_fillcolor='#d93025',
+        decreasing_line_color='#1e8e3e', decreasing_fillcolor='#1e8e3e',
+    ), row=1, col=1)
+    for col, name, color in (('ma5', 'MA5', '#f5a623'), ('ma10', 'MA10', '#7b61ff'), ('ma20', 'MA20', '#1e3c72')):
+        if col in data: fig.add_trace(go.Scatter(x=x, y=data[col], name=name, line=dict(width=1, color=color)), row=1, col=1)
+    if 'bb_up' in data:
+        fig.add_trace(go.Scatter(x=x, y=data['bb_up'], name="布林上轨", line=dict(width=1, dash='dot', color='#999')), row=1, col=1)
+        fig.add_trace(go.Scatter(x=x, y=data['bb_low'], name="布林下轨", line=dict(width=1, dash='dot', color='#999'),
+                                 fill='tonexty', fillcolor='rgba(150,150,150,0.06)'), row=1, col=1)
+
+    if 'macd' in data:
+        colors = np.where(data['macd'].fillna(0) >= 0, '#d93025', '#1e8e3e')
+        fig.add_trace(go.Bar(x=x, y=data['macd'], name="MACD", marker_color=colors), row=2, col=1)
+        fig.add_trace(go.Scatter(x=x, y=data['dif'], name="DIF", line=dict(width=1, color='#f5a623')), row=2, col=1)
+        fig.add_trace(go.Scatter(x=x, y=data['dea'], name="DEA", line=dict(width=1, color='#1e3c72')), row=2, col=1)
+    if 'rsi' in data:
+        fig.add_trace(go.Scatter(x=x, y=data['rsi'], name="RSI", line=dict(width=1, color='#764ba2')), row=3, col=1)
+        for level in (30, 70): fig.add_hline(y=level, line=dict(width=1, dash='dash', color='#ccc'), row=3, col=1)
+
+    # 分类轴：跳过周末 / 节假日的空档
+    fig.update_xaxes(type='category', nticks=10, rangeslider_visible=False)
+    fig.update_layout(
+        title=title, height=680, margin=dict(l=10, r=10, t=40 if title else 10, b=10),
+        legend=dict(orientation='h', y=1.02, x=0), plot_bgcolor='white', hovermode='x unified',
+    )
+    return fig
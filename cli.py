@@ -0,0 +1,123 @@
+import time
+_T0 = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+# 注意：本文件只在顶层导入标准库，数据层 / AI 层在子命令内部按需导入，
+# 保证 `python cli.py --help` 与无 AI 的批量取数都不需要加载 streamlit / openai。
+
+def _read_codes(args):
+    codes = list(args.codes)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line: codes.extend(line.replace(',', ' ').split())
+    return codes
+
+def _emit(results, fmt):
+    if fmt == "json":
+        print(json.dumps(results if len(results) != 1 else results[0], ensure_ascii=False, indent=2))
+    else:
+        from pipeline import to_markdown
+        print("\n---\n\n".join(to_markdown(r) for r in results))
+
+def cmd_analyze(args):
+    codes = _read_codes(args)
+    if not codes:
+        print("请提供股票代码或 --file", file=sys.stderr)
+        return 2
+
+    t_import = time.perf_counter()
+    from pipeline import analyze_stock
+    t_imported = time.perf_counter()
+
+    results, first_fetch = [], None
+    for code in codes:
+        t = time.perf_counter()
+        results.append(analyze_stock(code, style=args.style, predict_cycle=args.cycle, with_ai=not args.no_ai))
+        if first_fetch is None: first_fetch = time.perf_counter() - t
+        if args.timing: print(f"[timing] {code}: {time.perf_counter() - t:.3f}s", file=sys.stderr)
+
+    if args.timing:
+        print(f"[timing] cli 启动: {t_import - _T0:.3f}s, 导入数据/AI层: {t_imported - t_import:.3f}s, "
+              f"首个标的: {first_fetch:.3f}s, 启动到首个结果: {t_imported - _T0 + first_fetch:.3f}s", file=sys.stderr)
+
+    _emit(results, args.format)
+    return 1 if all("错误" in r for r in results) else 0
+
+def cmd_compare(args):
+    codes = _read_codes(args)
+    if len(codes) < 2:
+        print("对比至少需要 2 个股票代码", file=sys.stderr)
+        return 2
+
+    from core_logic import min_comparison_budget
+    need = min_comparison_budget(args.cycle, args.style)
+    if args.budget < need:
+        print(f"--budget {args.budget} 过小，至少需要 {need}", file=sys.stderr)
+        return 2
+
+    from pipeline import compare_stocks, comparison_to_markdown
+    t = time.perf_counter()
+    result = compare_stocks(codes, style=args.style, predict_cycle=args.cycle, with_ai=not args.no_ai, token_budget=args.budget)
+    if args.timing: print(f"[timing] {len(codes)} 只对比: {time.perf_counter() - t:.3f}s", file=sys.stderr)
+
+    if args.format == "json": print(json.dumps(result, ensure_ascii=False, indent=2))
+    else: print(comparison_to_markdown(result))
+    return 0 if len(result["标的"]) >= 2 else 1
+
+def cmd_search(args):
+    from data_utils import search_stocks
+    print(json.dumps(search_stocks(args.keyword), ensure_ascii=False, indent=2))
+    return 0
+
+def cmd_sync(args):
+    from local_store import run_sync
+    run_sync(args.years, args.sleep)
+    return 0
+
+def build_parser():
+    from core_logic import STYLES, CYCLES, COMPARE_TOKEN_BUDGET
+    parser = argparse.ArgumentParser(prog="cli.py", description="DeepSeek 智能投研 - 命令行入口")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("analyze", help="分析一只或多只股票")
+    p.add_argument("codes", nargs="*", help="股票代码，如 600519 00700")
+    p.add_argument("--file", help="批量代码文件 (每行一个或逗号/空格分隔，# 后为注释)")
+    p.add_argument("--style", default=STYLES[0], choices=STYLES, help="AI 分析风格")
+    p.add_argument("--cycle", default=CYCLES[0], choices=CYCLES, help="预测周期")
+    p.add_argument("--format", default="json", choices=["json", "md"], help="输出格式")
+    p.add_argument("--no-ai", action="store_true", help="只取数据，不调用模型")
+    p.add_argument("--timing", action="store_true", help="在 stderr 输出导入与取数耗时")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("compare", help="多股横向对比 (一次模型调用生成排名报告)")
+    p.add_argument("codes", nargs="*", help="股票代码，如 600519 000858 000568")
+    p.add_argument("--file", help="批量代码文件 (每行一个或逗号/空格分隔，# 后为注释)")
+    p.add_argument("--style", default=STYLES[0], choices=STYLES, help="AI 分析风格")
+    p.add_argument("--cycle", default=CYCLES[0], choices=CYCLES, help="预测周期")
+    p.add_argument("--budget", type=int, default=COMPARE_TOKEN_BUDGET, help="Prompt token 预算")
+    p.add_argument("--format", default="json", choices=["json", "md"], help="输出格式")
+    p.add_argument("--no-ai", action="store_true", help="只取数据，不调用模型")
+    p.add_argument("--timing", action="store_true", help="在 stderr 输出耗时")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("search", help="按名称或代码搜索股票")
+    p.add_argument("keyword")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("sync", help="同步本地行情库 (估值分位 / 行业对比 / 复权)")
+    p.add_argument("--years", type=int, default=10, help="回补年数")
+    p.add_argument("--sleep", type=float, default=0.0, help="每次请求间隔(秒)，用于限频")
+    p.set_defaults(func=cmd_sync)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,62 +1,42 @@
-import os
-import streamlit as st
-from openai import OpenAI
-from datetime import datetime
-from dotenv import load_dotenv
+import contextlib
 
-load_dotenv()
+from llm_client import (
+    has_endpoints,
+    hedged_stream,
+    hedged_call,
+    run_sync,
+)
 
-def get_config_value(key):
-    if hasattr(st, "secrets") and key in st.secrets:
-        return st.secrets[key]
-    return os.getenv(key, "")
+STYLES = ["稳健理智", "短线博弈", "激进犀利"]
+CYCLES = ["次日波动", "本周趋势", "月度展望"]
 
-ARK_API_KEY = get_config_value("ARK_API_KEY")
-ARK_MODEL_ENDPOINT = get_config_value("ARK_MODEL_ENDPOINT") 
-ARK_API_URL = "https://ark.cn-beijing.volces.com/api/v3"
+# 提高 temperature 可以让 AI 更敢说，更有创造力
+COMPLETION_PARAMS = {"temperature": 0.6, "max_tokens": 4000}
 
 def call_deepseek_api(prompt):
-    if not ARK_API_KEY or not ARK_MODEL_ENDPOINT:
+    if not has_endpoints():
         return "❌ 错误: 未配置 API Key 或 Endpoint ID。"
-
     try:
-        client = OpenAI(base_url=ARK_API_URL, api_key=ARK_API_KEY)
-        
-        completion = client.chat.completions.create(
-            model=ARK_MODEL_ENDPOINT,
-            messages=[{"role": "user", "content": prompt}],
-            # 提高 temperature 可以让 AI 更敢说，更有创造力
-            temperature=0.6, 
-            max_tokens=4000
-        )
-        return completion.choices[0].message.content
+        return run_sync(hedged_call(prompt, **COMPLETION_PARAMS))
     except Exception as e:
         return f"API调用失败: {str(e)}"
 
-def generate_analysis_prompt(stock_code, stock_name, predict_cycle, daily_data, fundamental_data, market_data, style="稳健理智"):
-    """
-    根据 style 生成不同风格的 Prompt
+# ===================== 异步调用 (API 服务使用) =====================
+
+async def astream_deepseek_api(prompt):
+    """逐段产出模型输出；出错时产出一条以 API调用失败 开头的文本"""
+    # 本生成器被提前关闭时同步关闭 hedged_stream，让其 finally 立即取消在途请求
+    async with contextlib.aclosing(hedged_stream(prompt, **COMPLETION_PARAMS)) as pieces:
+        async for piece in pieces:
+            yield piece
+
+async def acall_deepseek_api(prompt):
+    return await hedged_call(prompt, **COMPLETION_PARAMS)
+
+def get_style_persona(style):
     """
-    
-    # 数据格式化
-    def fmt(d): return {k: str(v) for k, v in d.items()}
-    daily = fmt(daily_data)
-    fund = fmt(fundamental_data)
-    mkt = fmt(market_data)
-    
-    base_info = f"""
-    ## 📊 标的数据
-    - **股票**：{stock_name} ({stock_code})
-    - **周期**：{predict_cycle}
-    - **收盘**：{daily.get('收盘价')} (涨跌 {daily.get('涨跌幅')})
-    - **均线**：MA5 {daily.get('5日均线')}, MA20 {daily.get('20日均线')}
-    - **指标**：MACD {daily.get('MACD')}, RSI {daily.get('RSI')}, 波动率 {daily.get('波动率')}
-    - **布林**：上轨 {daily.get('布林上轨')}, 下轨 {daily.get('布林下轨')}
-    - **资金**：成交量 {daily.get('成交量')}, 换手率 {daily.get('换手率')}
-    - **估值**：PE {fund.get('PE(TTM)')}, PB {fund.get('PB')}, 市值 {fund.get('总市值')}
-    - **环境**：市场情绪 {mkt.get('市场情绪')}, 指数涨跌 {mkt.get('市场指数涨跌幅')}
+    返回 (角色设定, 语气要求, 单股报告的输出要求)
     """
-
     # === 风格 1：稳健理智 (默认) ===
     if style == "稳健理智":
         role_desc = "你是一名严谨的**机构首席策略分析师**，注重风险控制和基本面逻辑。"
@@ -95,6 +75,36 @@ def generate_analysis_prompt(stock_code, stock_name, predict_cycle, daily_data,
         3. **主力意图**：根据成交量和换手率，推测主力是在吸筹、拉升还是出货。
         """
 
+    return role_desc, tone_req, instruction
+
+def generate_analysis_prompt(stock_code, stock_name, predict_cycle, daily_data, fundamental_data, market_data, style="稳健理智"):
+    """
+    根据 style 生成不同风格的 Prompt
+    """
+    
+    # 数据格式化
+    def fmt(d): return {k: str(v) for k, v in d.items()}
+    daily = fmt(daily_data)
+    fund = fmt(fundamental_data)
+    mkt = fmt(market_data)
+    
+    base_info = f"""
+    ## 📊 标的数据
+    - **股票**：{stock_name} ({stock_code})
+    - **周期**：{predict_cycle}
+    - **收盘**：{daily.get('收盘价')} (涨跌 {daily.get('涨跌幅')})
+    - **均线**：MA5 {daily.get('5日均线')}, MA20 {daily.get('20日均线')}
+    - **指标**：MACD {daily.get('MACD')}, RSI {daily.get('RSI')}, 波动率 {daily.get('波动率')}
+    - **布林**：上轨 {daily.get('布林上轨')}, 下轨 {daily.get('布林下轨')}
+    - **资金**：成交量 {daily.get('成交量')}, 换手率 {daily.get('换手率')}
+    - **估值**：PE {fund.get('PE(TTM)')}, PB {fund.get('PB')}, 市值 {fund.get('总市值')}
+    - **估值分位**：PE {fund.get('PE分位', 'N/A')}；PB {fund.get('PB分位', 'N/A')}；所属行业PE近5年分位 {fund.get('行业PE分位(5年)', 'N/A')}
+    - **同业对比**：行业 {fund.get('所属行业')}，行业PE中位数 {fund.get('行业PE中位数', 'N/A')}，PB中位数 {fund.get('行业PB中位数', 'N/A')}；PE排名(低→高) {fund.get('PE行业排名', 'N/A')}，市值排名 {fund.get('市值行业排名', 'N/A')}，涨幅排名 {fund.get('涨幅行业排名', 'N/A')}
+    - **环境**：市场情绪 {mkt.get('市场情绪')}, 指数涨跌 {mkt.get('市场指数涨跌幅')}
+    """
+
+    role_desc, tone_req, instruction = get_style_persona(style)
+
     prompt = f"""
     {role_desc}
     请基于以下数据进行深度复盘：
@@ -107,3 +117,125 @@ def generate_analysis_prompt(stock_code, stock_name, predict_cycle, daily_data,
     注意：如果是港股，请考虑无涨跌停限制的特性。
     """
     return prompt
+
+# ===================== 多股横向对比 =====================
+# 多只标的压缩成一张表放进同一个 Prompt，角色 / 风格 / 输出要求只写一次；
+# 超出 token 预算时先按优先级删列，仍超出再截掉排在后面的标的。
+
+COMPARE_TOKEN_BUDGET = 3000
+COMPARE_MAX_SYMBOLS = 10
+# 表格至少要放下表头 + 两只标的的核心列
+COMPARE_MIN_TABLE_TOKENS = 200
+
+# (列名, 取值函数, 优先级：数字越小越重要)
+COMPARE_COLUMNS = [
+    ("代码", lambda it: it["代码"], 0),
+    ("名称", lambda it: it["名称"], 0),
+    ("收盘", lambda it: it["行情"].get("收盘价"), 0),
+    ("涨跌", lambda it: it["行情"].get("涨跌幅"), 0),
+    ("PE", lambda it: it["基本面"].get("PE(TTM)"), 0),
+    ("RSI", lambda it: it["行情"].get("RSI"), 1),
+    ("MACD", lambda it: it["行情"].get("MACD"), 1),
+    ("PB", lambda it: it["基本面"].get("PB"), 1),
+    ("换手", lambda it: it["行情"].get("换手率"), 1),
+    ("MA5", lambda it: it["行情"].get("5日均线"), 2),
+    ("MA20", lambda it: it["行情"].get("20日均线"), 2),
+    ("波动率", lambda it: it["行情"].get("波动率"), 2),
+    ("行业", lambda it: it["基本面"].get("所属行业"), 2),
+    ("PE5年分位", lambda it: it["基本面"].get("PE分位(5年)"), 3),
+    ("市值", lambda it: it["基本面"].get("总市值"), 3),
+    ("PE行业排名", lambda it: it["基本面"].get("PE行业排名"), 4),
+    ("涨幅行业排名", lambda it: it["基本面"].get("涨幅行业排名"), 4),
+    ("布林上轨", lambda it: it["行情"].get("布林上轨"), 5),
+    ("布林下轨", lambda it: it["行情"].get("布林下轨"), 5),
+]
+
+def estimate_tokens(text):
+    """粗略估算：中文约 1 字 1 token，其余约 3 字符 1 token (宁多勿少)"""
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk + 2) // 3
+
+def _compact(v):
+    v = "-" if v is None else str(v)
+    return v.replace("N/A (Tushare源缺)", "N/A").replace("|", "/")
+
+def _render_table(items, columns):
+    lines = ["| " + " | ".join(c[0] for c in columns) + " |", "|" + "---|" * len(columns)]
+    for it in items:
+        lines.append("| " + " | ".join(_compact(c[1](it)) for c in columns) + " |")
+    return "\n".join(lines)
+
+def pack_comparison_table(items, token_budget):
+    """
+    items: [{"代码", "名称", "行情", "基本面", "市场环境"}, ...]
+    返回 {"table", "included", "omitted", "columns", "tokens"}
+    """
+    omitted = [it["代码"] for it in items[COMPARE_MAX_SYMBOLS:]]
+    items = items[:COMPARE_MAX_SYMBOLS]
+    levels = sorted({c[2] for c in COMPARE_COLUMNS}, reverse=True)
+
+    columns = list(COMPARE_COLUMNS)
+    table = _render_table(items, columns)
+    # 先删列 (保留优先级 0 的核心列)
+    for level in levels:
+        if estimate_tokens(table) <= token_budget or level == 0: break
+        columns = [c for c in columns if c[2] < level]
+        table = _render_table(items, columns)
+    # 再删行
+    while estimate_tokens(table) > token_budget and len(items) > 2:
+        omitted.insert(0, items[-1]["代码"])
+        items = items[:-1]
+        table = _render_table(items, columns)
+
+    return {
+        "table": table,
+        "included": [it["代码"] for it in items],
+        "omitted": omitted,
+        "columns": [c[0] for c in columns],
+        "tokens": estimate_tokens(table),
+    }
+
+def _comparison_frame(predict_cycle, style, envs):
+    """对比 Prompt 的固定部分 (表格前后)，返回 (head, tail)；head 中的 {n} 为标的数占位"""
+    role_desc, tone_req, _ = get_style_persona(style)
+    head = f"""
+    {role_desc}
+    请对以下 {{n}} 只标的做横向对比，周期：{predict_cycle}。
+    市场环境：{'；'.join(envs)}
+
+    ## 📊 对比数据
+    """
+    tail = f"""
+
+    ## 分析要求
+    - 语气风格：{tone_req}
+    请输出一份横向对比报告：
+    1. **综合排名**：按{predict_cycle}的相对吸引力从高到低排出全部标的，用表格列出 排名 / 代码 / 名称 / 评级 / 一句话理由。
+    2. **逐一点评**：每只标的 2-3 句，必须引用表中数据与组内其他标的对比。
+    3. **相对强弱**：指出组内技术面最强与最弱、估值最便宜与最贵的标的。
+    4. **配置建议**：结合上述风格给出组合层面的建议，并指出主要风险。
+
+    注意：表中 "-" / "N/A" 表示数据缺失，不要臆测；港股无涨跌停限制。
+    """
+    return head, tail
+
+def min_comparison_budget(predict_cycle, style="稳健理智"):
+    """取数前的预算下限检查：固定部分 (按 A股 + 港股两种市场环境估算) + 最小表格"""
+    envs = ["悲观 / -10.00% (沪深300)", "悲观 / -10.00% (恒生指数)"]
+    head, tail = _comparison_frame(predict_cycle, style, envs)
+    return estimate_tokens(head + tail) + COMPARE_MIN_TABLE_TOKENS
+
+def generate_comparison_prompt(items, predict_cycle, style="稳健理智", token_budget=COMPARE_TOKEN_BUDGET):
+    """
+    多股对比 Prompt，返回 (prompt, packed)；packed 见 pack_comparison_table，另含 prompt_tokens (整段 Prompt 的估算)
+    token_budget 不足以容纳固定部分 + 最小表格时抛 ValueError
+    """
+    envs = sorted({f"{it['市场环境'].get('市场情绪')} / {it['市场环境'].get('市场指数涨跌幅')}" for it in items})
+    head, tail = _comparison_frame(predict_cycle, style, envs)
+    overhead = estimate_tokens(head + tail)
+    if token_budget - overhead < COMPARE_MIN_TABLE_TOKENS:
+        raise ValueError(f"token 预算 {token_budget} 过小，至少需要 {overhead + COMPARE_MIN_TABLE_TOKENS}")
+    packed = pack_comparison_table(items, token_budget - overhead)
+    prompt = head.replace("{n}", str(len(packed["included"]))) + packed["table"] + tail
+    packed["prompt_tokens"] = estimate_tokens(prompt)
+    return prompt, packed
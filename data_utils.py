@@ -1,22 +1,21 @@
-import tushare as ts
 import pandas as pd
 from datetime import datetime, timedelta
-import os
 import re
-import streamlit as st
+from runtime_utils import get_config_value
+from frame_cache import market_cached, slice_from
+from valuation_utils import get_valuation_percentiles, format_percentile
+from adjust_utils import get_adjusted_bars
+from peer_utils import get_peer_context, format_rank, format_median
 
 # ===================== 基础工具 =====================
 
 def get_tushare_pro():
     try:
-        if hasattr(st, 'secrets') and 'TUSHARE_TOKEN' in st.secrets:
-            token = st.secrets['TUSHARE_TOKEN']
-        else:
-            token = os.getenv("TUSHARE_TOKEN", "")
-        
+        token = get_config_value("TUSHARE_TOKEN")
         if not token: return None
-        ts.set_token(token)
-        return ts.pro_api()
+        # 延迟导入：tushare 导入较重，只在真正需要取数时加载
+        import tushare as ts
+        return ts.pro_api(token)
     except: return None
 
 def validate_stock_code(code):
@@ -140,7 +139,61 @@ def get_enhanced_technical_indicators(df):
 
 # ===================== 数据获取主入口 =====================
 
-@st.cache_data(ttl=600) 
+# Tushare daily / hk_daily 单次最多返回 6000 行 (约 24 年)，更长的历史按 end_date 向前翻页
+DAILY_PAGE_ROWS = 6000
+# 取全部上市以来的日线时使用的起始日
+HISTORY_START = "19900101"
+
+def _fetch_daily_paged(call, ts_code, start, end):
+    pages, df = [], None
+    while True:
+        df = call(ts_code=ts_code, start_date=start, end_date=end)
+        if df is None or df.empty: break
+        pages.append(df)
+        if len(df) < DAILY_PAGE_ROWS: break
+        end = (datetime.strptime(str(df['trade_date'].min()), '%Y%m%d') - timedelta(days=1)).strftime('%Y%m%d')
+    if len(pages) > 1: return pd.concat(pages, ignore_index=True)
+    return pages[0] if pages else df
+
+def fetch_daily_bars(pro, ts_code, start, end):
+    """
+    获取日线，返回 (df, 复权方式)
+    A股优先使用本地库的前复权日线，避免除权日均线/布林/MACD 跳变；库不新鲜时走远程未复权数据
+    """
+    if ts_code.endswith('.HK'):
+        return _fetch_daily_paged(pro.hk_daily, ts_code, start, end), "不复权"
+    local = get_adjusted_bars(ts_code, start_date=start, how='qfq')
+    if local is not None and not local.empty:
+        return local, "前复权"
+    return _fetch_daily_paged(pro.daily, ts_code, start, end), "不复权"
+
+@market_cached
+def get_indicator_frame(ts_code, days=None):
+    """
+    日线 + 全部技术指标 (按字节预算缓存，返回只读视图)；days=None 取上市以来全部日线
+    df.attrs['adjust'] 为复权方式；无数据返回 None，接口异常向上抛出
+    """
+    pro = get_tushare_pro()
+    if not pro: return None
+    end = datetime.now().strftime('%Y%m%d')
+    start = HISTORY_START if days is None else (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+    df, adjust = fetch_daily_bars(pro, ts_code, start, end)
+    if df is None or df.empty: return None
+    df = get_enhanced_technical_indicators(df)
+    df.attrs['adjust'] = adjust
+    return df
+
+def get_market_history(ts_code):
+    """
+    上市以来全部日线 + 技术指标 (K线图与 get_clean_market_data 共用一份缓存)，失败返回 None
+    """
+    try:
+        return get_indicator_frame(ts_code)
+    except Exception as e:
+        print(f"History Error: {e}")
+        return None
+
+@market_cached
 def get_clean_market_data(ts_code, days=90):
     pro = get_tushare_pro()
     if not pro: return {"错误": "Token无效"}
@@ -149,25 +202,18 @@ def get_clean_market_data(ts_code, days=90):
         # 1. 获取基本面指标 (A股有，港股无)
         metrics = get_latest_metrics(pro, ts_code)
         
-        # 2. 获取K线行情 (A股/港股都有)
-        end = datetime.now().strftime('%Y%m%d')
-        start = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
-        
-        df = pd.DataFrame()
-        if ts_code.endswith('.HK'):
-            try: df = pro.hk_daily(ts_code=ts_code, start_date=start, end_date=end)
-            except Exception as e: return {"错误": f"港股接口错: {e}"}
-        else:
-            df = pro.daily(ts_code=ts_code, start_date=start, end_date=end)
-        
-        if df.empty: return {"错误": "暂无行情数据"}
+        # 2. K线行情与技术指标：在完整历史上计算后截取近 days 天，与K线图共用一次远程调用
+        try: df = get_indicator_frame(ts_code)
+        except Exception as e: return {"错误": f"港股接口错: {e}" if ts_code.endswith('.HK') else str(e)}
         
-        # 3. 计算技术指标
-        df = get_enhanced_technical_indicators(df)
+        if df is not None: df = slice_from(df, (datetime.now() - timedelta(days=days)).strftime('%Y%m%d'))
+        if df is None or df.empty: return {"错误": "暂无行情数据"}
+        adjust = df.attrs.get('adjust', "不复权")
         latest = df.iloc[-1]
 
         return {
-            "收盘价": f"{latest['close']}",
+            # 缓存中价格为 float32，原始价最多 3 位小数，取整去掉精度尾巴
+            "收盘价": f"{latest['close']:.2f}" if adjust == "前复权" else f"{round(float(latest['close']), 3)}",
             "涨跌幅": f"{latest['pct_chg']:.2f}%",
             "成交量": f"{latest['vol']/10000:.2f}万手",
             "换手率": metrics['turnover_rate'], 
@@ -180,6 +226,7 @@ def get_clean_market_data(ts_code, days=90):
             "布林中轨": f"{latest['bb_mid']:.2f}" if pd.notna(latest['bb_mid']) else "-",
             "布林下轨": f"{latest['bb_low']:.2f}" if pd.notna(latest['bb_low']) else "-",
             "波动率": f"{latest['volatility']:.4f}" if pd.notna(latest['volatility']) else "-",
+            "复权方式": adjust,
             "_metrics_cache": metrics 
         }
     except Exception as e: return {"错误": str(e)}
@@ -208,11 +255,31 @@ def get_clean_fundamental_data(ts_code, daily_data=None):
             if not b.empty: industry = b.iloc[0]['industry']
     except: pass
 
+    # 历史估值分位 (读取本地库，不额外请求接口)
+    pct = get_valuation_percentiles(ts_code)
+    def fmt_pct(d): return " / ".join(f"{y}年 {format_percentile(p)}" for y, p in d.items())
+
+    # 行业同业对比 (每日预计算结果)
+    peer = get_peer_context(ts_code)
+
     return {
         "PE(TTM)": metrics['pe_ttm'],
         "PB": metrics['pb'],
         "总市值": metrics['total_mv'],
-        "所属行业": industry
+        "所属行业": industry,
+        "PE分位": fmt_pct(pct['pe_ttm']),
+        "PB分位": fmt_pct(pct['pb']),
+        "PE分位(5年)": format_percentile(pct['pe_ttm'][5]),
+        "PB分位(5年)": format_percentile(pct['pb'][5]),
+        "行业PE分位(5年)": format_percentile(pct['industry_pe_ttm'][5]),
+        "行业PB分位(5年)": format_percentile(pct['industry_pb'][5]),
+        "行业PE中位数": format_median(peer, 'pe_ttm'),
+        "行业PB中位数": format_median(peer, 'pb'),
+        "行业市值中位数": format_median(peer, 'total_mv', 10000, "亿"),
+        "PE行业排名": format_rank(peer, 'pe_ttm'),
+        "市值行业排名": format_rank(peer, 'total_mv'),
+        "换手行业排名": format_rank(peer, 'turnover_rate'),
+        "涨幅行业排名": format_rank(peer, 'pct_chg')
     }
 
 def get_market_environment_data(ts_code):
@@ -0,0 +1,174 @@
+import functools
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from runtime_utils import get_config_value
+
+# ===================== 行情数据缓存 (按字节预算) =====================
+# 替代 st.cache_data 缓存K线 / 指标结果：
+#   - 总大小按字节封顶，超出时先清掉已过期 (TTL) 的条目，仍超出再按 LRU 淘汰；过期条目被访问时也会剔除
+#   - 入库时压缩 dtype：浮点 -> float32，trade_date -> int32 (YYYYMMDD)，低基数字符串 -> category
+#   - 各列以只读 numpy 数组保存，取出时构造零拷贝的 DataFrame 视图；对视图原地赋值会抛
+#     ValueError (assignment destination is read-only)，需要修改时先 .copy()
+#   - dict 结果在缓存内冻结 (嵌套 dict -> 只读映射，list -> tuple，数组只读)；每次取出 / 存入返回
+#     一份普通 dict 的浅拷贝 (嵌套 dict 同样转回 dict)，可直接 json.dumps / pickle，改动不影响缓存
+# 命中率、占用字节数、淘汰次数可通过 get_market_cache_stats() 查看。
+
+MARKET_CACHE_MB = float(get_config_value("MARKET_CACHE_MB", "64"))
+MARKET_CACHE_TTL = int(get_config_value("MARKET_CACHE_TTL", "600"))
+
+def compact_frame(df):
+    """压缩 dtype 并拆成只读列数组，返回 (columns, attrs, nbytes)"""
+    columns = {}
+    nbytes = 0
+    for col in df.columns:
+        s = df[col]
+        if col == 'trade_date':
+            arr = pd.to_numeric(s, errors='coerce').fillna(0).to_numpy(dtype=np.int32)
+        elif pd.api.types.is_float_dtype(s) or pd.api.types.is_integer_dtype(s):
+            arr = s.to_numpy(dtype=np.float32)
+        elif s.dtype == object or pd.api.types.is_string_dtype(s):
+            # 用只读的 codes 重建，否则视图上给字符串列赋值会改写缓存中的 codes
+            cat = pd.Categorical(s)
+            codes = cat.codes.copy()
+            codes.flags.writeable = False
+            arr = pd.Categorical.from_codes(codes, dtype=cat.dtype)
+            nbytes += codes.nbytes + sum(sys.getsizeof(c) for c in arr.categories)
+            columns[col] = arr
+            continue
+        else:
+            arr = s.to_numpy(copy=True)
+        arr.flags.writeable = False
+        nbytes += arr.nbytes
+        columns[col] = arr
+    return columns, dict(df.attrs), nbytes
+
+def frame_view(columns, attrs):
+    df = pd.DataFrame(columns, copy=False)
+    df.attrs.update(attrs)
+    return df
+
+def freeze(value):
+    """dict -> 只读映射，list -> tuple，numpy 数组置为只读 (递归)"""
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return types.MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list): return tuple(freeze(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value = value.view()
+        value.flags.writeable = False
+    return value
+
+def thaw(value):
+    """freeze 的出口：只读映射 -> 普通 dict (递归)，叶子值 (tuple / 只读数组 / 标量) 原样共享"""
+    if isinstance(value, (dict, types.MappingProxyType)): return {k: thaw(v) for k, v in value.items()}
+    return value
+
+def _estimate_bytes(value):
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + _estimate_bytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+class FrameCache:
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, kind, payload, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "rejected": 0}
+
+    def _drop(self, key):
+        _, _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _sweep_expired(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e[0] < now]:
+            self._drop(key)
+            self._stats["expired"] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            _, kind, payload, _ = entry
+        return frame_view(*payload) if kind == "frame" else thaw(payload)
+
+    def put(self, key, value):
+        """存入并返回缓存中的版本 (DataFrame 为压缩后的只读视图，dict 为冻结内容的普通 dict 拷贝)"""
+        if isinstance(value, pd.DataFrame):
+            columns, attrs, nbytes = compact_frame(value)
+            kind, payload = "frame", (columns, attrs)
+        else:
+            kind, payload, nbytes = "object", freeze(value), _estimate_bytes(value)
+
+        with self._lock:
+            if key in self._entries: self._drop(key)
+            if nbytes > self.max_bytes:
+                self._stats["rejected"] += 1
+            else:
+                self._entries[key] = (time.monotonic() + self.ttl, kind, payload, nbytes)
+                self._bytes += nbytes
+                if self._bytes > self.max_bytes: self._sweep_expired()
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self._stats["evictions"] += 1
+        return frame_view(*payload) if kind == "frame" else thaw(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=self._stats["hits"] / total if total else 0.0,
+            )
+
+market_cache = FrameCache(MARKET_CACHE_MB * 1024 * 1024, MARKET_CACHE_TTL)
+
+def market_cached(func):
+    """按参数缓存到 market_cache；None 与含 "错误" 的结果不缓存"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        hit = market_cache.get(key)
+        if hit is not None: return hit
+        value = func(*args, **kwargs)
+        if value is None or (isinstance(value, dict) and "错误" in value): return value
+        return market_cache.put(key, value)
+    return wrapper
+
+def date_key(dates, yyyymmdd):
+    """把 'YYYYMMDD' 转成与 trade_date 列同类型的值 (缓存中的列为 int32)"""
+    return int(yyyymmdd) if pd.api.types.is_integer_dtype(dates) else str(yyyymmdd)
+
+def slice_from(df, yyyymmdd):
+    """df 按 trade_date 升序，取 >= yyyymmdd 的部分 (二分定位 + 切片，不复制数据)"""
+    if df.empty: return df
+    i = np.searchsorted(df['trade_date'].to_numpy(), date_key(df['trade_date'], yyyymmdd), side='left')
+    return df.iloc[i:]
+
+def get_market_cache_stats():
+    return market_cache.stats()
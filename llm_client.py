@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+
+from dotenv import load_dotenv
+from runtime_utils import get_config_value
+
+load_dotenv()
+
+# ===================== 模型接入点配置 =====================
+# ARK_MODEL_ENDPOINT 为主接入点；ARK_FALLBACK_ENDPOINTS 为逗号分隔的备用接入点，每项可写成：
+#   ep-xxx                       同一 ARK_API_URL / ARK_API_KEY 下的另一个接入点
+#   https://host/api/v3|ep-xxx   另一个服务地址 (沿用 ARK_API_KEY)
+#   https://host/api/v3|ep-xxx|key
+# 对冲 (hedging)：主接入点在阈值内没吐出首个 token，就向下一个接入点发备份请求，谁先完成用谁，另一路取消；
+# 阈值取历史首 token 延迟的 ARK_HEDGE_PERCENTILE 分位，样本不足时用 ARK_HEDGE_DELAY。
+# 报错则直接切换到下一个接入点 (failover)。
+
+ARK_API_KEY = get_config_value("ARK_API_KEY")
+ARK_MODEL_ENDPOINT = get_config_value("ARK_MODEL_ENDPOINT")
+ARK_API_URL = get_config_value("ARK_API_URL") or "https://ark.cn-beijing.volces.com/api/v3"
+ARK_FALLBACK_ENDPOINTS = get_config_value("ARK_FALLBACK_ENDPOINTS")
+
+HEDGE_ENABLED = str(get_config_value("ARK_HEDGE_ENABLED", "1")).lower() not in ("0", "false", "no")
+HEDGE_PERCENTILE = float(get_config_value("ARK_HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY = float(get_config_value("ARK_HEDGE_DELAY", "8"))
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MIN_SAMPLES = 20
+
+def parse_endpoints(primary_model, api_url, api_key, fallbacks):
+    endpoints = []
+    if api_key and primary_model:
+        endpoints.append({"name": "primary", "base_url": api_url, "api_key": api_key, "model": primary_model})
+    for i, item in enumerate(x.strip() for x in (fallbacks or "").split(',')):
+        if not item: continue
+        parts = [p.strip() for p in item.split('|')]
+        base_url, model, key = api_url, parts[0], api_key
+        if len(parts) >= 2: base_url, model = parts[0], parts[1]
+        if len(parts) >= 3: key = parts[2]
+        if key and model:
+            endpoints.append({"name": f"fallback{i + 1}", "base_url": base_url, "api_key": key, "model": model})
+    return endpoints
+
+ENDPOINTS = parse_endpoints(ARK_MODEL_ENDPOINT, ARK_API_URL, ARK_API_KEY, ARK_FALLBACK_ENDPOINTS)
+
+def has_endpoints():
+    # 读模块属性而不是导入时的值：ENDPOINTS 可能在运行中被替换 (如 tools/hedge_check.py)
+    return bool(ENDPOINTS)
+
+# ===================== 延迟统计 =====================
+
+_ttft_samples = deque(maxlen=500)
+_stats = {"requests": 0, "hedged": 0, "failover": 0, "failed": 0, "wins": {}}
+# API 服务的事件循环与同步调用的后台循环在不同线程里更新计数
+_stats_lock = threading.Lock()
+
+def _count(key, endpoint=None):
+    with _stats_lock:
+        if endpoint is None: _stats[key] += 1
+        else: _stats[key][endpoint] = _stats[key].get(endpoint, 0) + 1
+
+def record_ttft(seconds):
+    _ttft_samples.append(seconds)
+
+def get_hedge_delay():
+    """对冲阈值：首 token 延迟的高分位 (样本不足时用默认值)"""
+    if len(_ttft_samples) < HEDGE_MIN_SAMPLES: return HEDGE_DEFAULT_DELAY
+    values = sorted(_ttft_samples)
+    p = values[min(len(values) - 1, int(len(values) * HEDGE_PERCENTILE / 100))]
+    return max(HEDGE_MIN_DELAY, p)
+
+def get_llm_stats():
+    with _stats_lock:
+        stats = dict(_stats, wins=dict(_stats["wins"]))
+    return dict(stats, hedge_delay=get_hedge_delay(), samples=len(_ttft_samples))
+
+# ===================== 客户端 =====================
+# httpx 异步连接池绑定事件循环，按 (事件循环, 接入点) 复用客户端。
+
+_clients = weakref.WeakKeyDictionary()
+
+def get_endpoint_client(ep):
+    from openai import AsyncOpenAI
+    per_loop = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (ep["base_url"], ep["api_key"])
+    if key not in per_loop:
+        # 重试由本模块的 failover 负责，SDK 自身不再重试
+        per_loop[key] = AsyncOpenAI(base_url=ep["base_url"], api_key=ep["api_key"], timeout=120, max_retries=0)
+    return per_loop[key]
+
+async def _stream_attempt(ep, prompt, on_piece, first_token, **params):
+    """单路流式请求：片段通过 on_piece 回调送出，结束时返回全文"""
+    t0 = time.perf_counter()
+    stream = await get_endpoint_client(ep).chat.completions.create(
+        model=ep["model"],
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        **params
+    )
+    parts = []
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    record_ttft(time.perf_counter() - t0)
+                    first_token.set()
+                parts.append(chunk.choices[0].delta.content)
+                on_piece(chunk.choices[0].delta.content)
+    finally:
+        # 被取消时关闭连接，让服务端停止生成
+        await stream.close()
+    if not parts: raise RuntimeError(f"{ep['name']} 返回空内容")
+    return "".join(parts)
+
+async def hedged_stream(prompt, race_to_finish=False, **params):
+    """
+    带对冲与故障切换的模型调用，逐段产出文本
+    race_to_finish=False  首个吐出 token 的一路胜出，其余取消 (用于流式输出)
+    race_to_finish=True   各路跑到结束，最先完成的一路胜出，一次性产出全文
+    两种模式都只在在途请求都还没吐出首 token 时才发备份请求
+    全部接入点失败时产出一条以 API调用失败 开头的文本
+    """
+    if not has_endpoints():
+        yield "❌ 错误: 未配置 API Key 或 Endpoint ID。"
+        return
+
+    _count("requests")
+    loop = asyncio.get_running_loop()
+    waiting = list(ENDPOINTS)
+    attempts = {}  # task -> (接入点, 片段队列, 该路首 token 事件)
+    errors = []
+    hedged = not HEDGE_ENABLED or len(ENDPOINTS) < 2
+
+    def launch():
+        ep = waiting.pop(0)
+        pieces = asyncio.Queue()
+        first_token = asyncio.Event()
+        task = asyncio.create_task(_stream_attempt(ep, prompt, pieces.put_nowait, first_token, **params))
+        attempts[task] = (ep, pieces, first_token)
+
+    def streaming():
+        # 只看在途的请求：报错退出的一路即使吐过 token 也不算，切换后的接入点仍可被对冲
+        return next((t for t, (_, _, ev) in attempts.items() if ev.is_set()), None)
+
+    launch()
+    hedge_at = loop.time() + get_hedge_delay()
+    winner = None
+    try:
+        while attempts and winner is None:
+            if not race_to_finish and streaming() is not None:
+                winner = streaming()
+                break
+            timeout = None
+            if not hedged and waiting and streaming() is None:
+                timeout = max(0.0, hedge_at - loop.time())
+            # 两种模式都等待首 token：已经开始吐字的请求不再触发对冲
+            token_waits = {asyncio.ensure_future(ev.wait()) for _, _, ev in attempts.values() if not ev.is_set()}
+            done, _ = await asyncio.wait(set(attempts) | token_waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for w in token_waits: w.cancel()
+
+            if not done:
+                # 到达对冲阈值仍无首 token：发备份请求
+                if streaming() is None:
+                    hedged = True
+                    _count("hedged")
+                    launch()
+                continue
+
+            for task in done:
+                if task not in attempts: continue
+                ep, _, _ = attempts[task]
+                if task.exception() is None:
+                    winner = task
+                    break
+                errors.append(f"{ep['name']}: {task.exception()}")
+                del attempts[task]
+                # 报错且没有其他在途请求时切换到下一个接入点
+                if not attempts and waiting:
+                    _count("failover")
+                    launch()
+                    hedge_at = loop.time() + get_hedge_delay()
+
+        if winner is None:
+            _count("failed")
+            yield f"API调用失败: {'; '.join(errors) or '无可用接入点'}"
+            return
+
+        ep, pieces, _ = attempts[winner]
+        _count("wins", ep["name"])
+        for task in list(attempts):
+            if task is not winner: task.cancel()
+
+        if race_to_finish:
+            yield winner.result()
+            return
+        while True:
+            get = asyncio.ensure_future(pieces.get())
+            done, _ = await asyncio.wait({get, winner}, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                yield get.result()
+                continue
+            get.cancel()
+            while not pieces.empty(): yield pieces.get_nowait()
+            if winner.exception() is not None:
+                yield f"\n\nAPI调用失败: {winner.exception()}"
+            return
+    finally:
+        for task in attempts:
+            if not task.done(): task.cancel()
+
+async def hedged_call(prompt, **params):
+    return "".join([piece async for piece in hedged_stream(prompt, race_to_finish=True, **params)])
+
+# ===================== 同步调用 =====================
+# Streamlit / CLI 为同步代码，统一提交到一个常驻后台事件循环执行，复用连接池。
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+    return _loop
+
+def run_sync(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
@@ -0,0 +1,316 @@
+import bisect
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+# ===================== 本地行情库 (SQLite) =====================
+# 按交易日批量拉取全市场数据落盘，供估值分位、行业对比等离线计算复用。
+# 路径可通过环境变量 STOCK_STORE_PATH 指定，默认在项目目录下。
+# 只有同步会创建库文件与表结构；查询路径只读打开，未同步时各项显示 N/A。
+
+STORE_PATH = os.getenv("STOCK_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stock_store.db"))
+
+DAILY_BASIC_FIELDS = ['ts_code', 'trade_date', 'close', 'turnover_rate', 'pe_ttm', 'pb', 'total_mv']
+ADJ_FACTOR_FIELDS = ['ts_code', 'trade_date', 'adj_factor']
+DAILY_FIELDS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close', 'pct_chg', 'vol', 'amount']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_basic (
+    ts_code TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    close REAL,
+    turnover_rate REAL,
+    pe_ttm REAL,
+    pb REAL,
+    total_mv REAL,
+    PRIMARY KEY (ts_code, trade_date)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_basic_date ON daily_basic (trade_date);
+CREATE TABLE IF NOT EXISTS daily (
+    ts_code TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    pre_close REAL,
+    pct_chg REAL,
+    vol REAL,
+    amount REAL,
+    PRIMARY KEY (ts_code, trade_date)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_date ON daily (trade_date);
+CREATE TABLE IF NOT EXISTS adj_factor (
+    ts_code TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    adj_factor REAL,
+    PRIMARY KEY (ts_code, trade_date)
+);
+CREATE INDEX IF NOT EXISTS idx_adj_factor_date ON adj_factor (trade_date);
+CREATE TABLE IF NOT EXISTS industry_stats (
+    trade_date TEXT NOT NULL,
+    industry TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    peers INTEGER,
+    p25 REAL,
+    median REAL,
+    p75 REAL,
+    PRIMARY KEY (trade_date, industry, metric)
+);
+CREATE TABLE IF NOT EXISTS peer_rank (
+    trade_date TEXT NOT NULL,
+    ts_code TEXT NOT NULL,
+    industry TEXT,
+    peers INTEGER,
+    pe_ttm_rank INTEGER,
+    pb_rank INTEGER,
+    total_mv_rank INTEGER,
+    turnover_rate_rank INTEGER,
+    pct_chg_rank INTEGER,
+    PRIMARY KEY (trade_date, ts_code)
+);
+CREATE TABLE IF NOT EXISTS stock_basic (
+    ts_code TEXT PRIMARY KEY,
+    name TEXT,
+    industry TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def get_store_conn(path=None, readonly=False):
+    """
+    readonly=True  供查询路径使用：只读打开，不建表；库文件不存在时返回 None (未同步过)
+    readonly=False 供同步使用：不存在则创建并建表
+    """
+    path = path or STORE_PATH
+    if readonly:
+        if not os.path.exists(path): return None
+        return sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def get_store_version(conn):
+    """库内最新交易日，用作内存索引的失效标记"""
+    row = conn.execute("SELECT MAX(trade_date) FROM daily_basic").fetchone()
+    return row[0] or ""
+
+# ===================== 批量同步 =====================
+
+def get_open_trade_dates(pro, start, end):
+    df = pro.trade_cal(exchange='SSE', start_date=start, end_date=end, is_open='1', fields='cal_date')
+    if df is None or df.empty: return []
+    return sorted(df['cal_date'].astype(str).tolist())
+
+def sync_trade_cal(pro, conn, days_back=30, days_ahead=120):
+    """
+    交易日历 (含未来已公布的部分) 存入 meta，供判断本地数据是否新鲜时跳过节假日
+    trade_cal_open: 逗号分隔的开市日；trade_cal_until: 日历覆盖到的最后一天
+    """
+    start = (datetime.now() - timedelta(days=days_back)).strftime('%Y%m%d')
+    end = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y%m%d')
+    df = pro.trade_cal(exchange='SSE', start_date=start, end_date=end, fields='cal_date,is_open')
+    if df is None or df.empty: return 0
+    df['cal_date'] = df['cal_date'].astype(str)
+    opened = df[df['is_open'].astype(str) == '1'] if 'is_open' in df.columns else df
+    set_meta(conn, 'trade_cal_open', ','.join(sorted(opened['cal_date'])))
+    set_meta(conn, 'trade_cal_until', df['cal_date'].max())
+    conn.commit()
+    return len(opened)
+
+def sync_stock_basic(pro, conn):
+    df = pro.stock_basic(exchange='', list_status='L', fields='ts_code,name,industry')
+    if df is None or df.empty: return 0
+    conn.execute("DELETE FROM stock_basic")
+    conn.executemany(
+        "INSERT INTO stock_basic (ts_code, name, industry) VALUES (?, ?, ?)",
+        df[['ts_code', 'name', 'industry']].itertuples(index=False, name=None)
+    )
+    conn.commit()
+    return len(df)
+
+def _existing_dates(conn, table):
+    return {r[0] for r in conn.execute(f"SELECT DISTINCT trade_date FROM {table}")}
+
+def _insert_frame(conn, table, df, fields):
+    df = df.reindex(columns=fields)
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})", rows
+    )
+    conn.commit()
+    return len(df)
+
+def _sync_by_trade_date(pro, conn, table, fetch, fields, years, sleep=0.0, progress=None, on_frame=None):
+    """
+    按交易日批量补齐全市场数据 (一次调用 = 一天全市场)
+    已落盘的交易日自动跳过，可反复执行做增量更新。
+    """
+    end = datetime.now().strftime('%Y%m%d')
+    start = (datetime.now() - timedelta(days=365 * years + 5)).strftime('%Y%m%d')
+    done = _existing_dates(conn, table)
+    todo = [d for d in get_open_trade_dates(pro, start, end) if d not in done]
+
+    inserted = 0
+    for i, d in enumerate(todo):
+        try:
+            df = fetch(trade_date=d, fields=','.join(fields))
+        except Exception as e:
+            print(f"{table} {d} Error: {e}")
+            continue
+        if df is None or df.empty: continue
+        if on_frame: on_frame(d, df)
+        inserted += _insert_frame(conn, table, df, fields)
+        if progress: progress(table, i + 1, len(todo), d)
+        if sleep: time.sleep(sleep)
+
+    set_meta(conn, f'{table}_synced_at', datetime.now().strftime('%Y%m%d%H%M%S'))
+    conn.commit()
+    return inserted
+
+def sync_daily_basic(pro, conn, years=10, sleep=0.0, progress=None):
+    return _sync_by_trade_date(pro, conn, 'daily_basic', pro.daily_basic, DAILY_BASIC_FIELDS, years, sleep, progress)
+
+def sync_daily(pro, conn, years=10, sleep=0.0, progress=None):
+    return _sync_by_trade_date(pro, conn, 'daily', pro.daily, DAILY_FIELDS, years, sleep, progress)
+
+def _latest_adj_factors(conn):
+    return dict(conn.execute(
+        "SELECT a.ts_code, a.adj_factor FROM adj_factor a "
+        "JOIN (SELECT ts_code, MAX(trade_date) AS trade_date FROM adj_factor GROUP BY ts_code) m "
+        "ON a.ts_code = m.ts_code AND a.trade_date = m.trade_date"
+    ).fetchall())
+
+def sync_adj_factor(pro, conn, years=10, sleep=0.0, progress=None):
+    """
+    同步复权因子，返回 (新增条数, 因子发生变化的标的集合)
+    因子变化 = 出现新的除权除息日，只有这些标的的复权价需要重算。
+    """
+    last = _latest_adj_factors(conn)
+    changed = set()
+    def on_frame(d, df):
+        for code, f in zip(df['ts_code'], df['adj_factor']):
+            prev = last.get(code)
+            if prev is not None and f is not None and abs(f - prev) > 1e-9: changed.add(code)
+            last[code] = f
+    inserted = _sync_by_trade_date(pro, conn, 'adj_factor', pro.adj_factor, ADJ_FACTOR_FIELDS, years, sleep, progress, on_frame)
+    return inserted, changed
+
+# ===================== 读取 =====================
+
+def load_symbol_history(conn, ts_code, start_date, fields=('pe_ttm', 'pb')):
+    cols = ', '.join(fields)
+    return pd.read_sql_query(
+        f"SELECT trade_date, {cols} FROM daily_basic WHERE ts_code=? AND trade_date>=? ORDER BY trade_date",
+        conn, params=(ts_code, start_date)
+    )
+
+def load_industry_history(conn, industry, start_date, fields=('pe_ttm', 'pb')):
+    cols = ', '.join(f"d.{f}" for f in fields)
+    return pd.read_sql_query(
+        f"SELECT d.ts_code, d.trade_date, {cols} FROM daily_basic d "
+        "JOIN stock_basic b ON d.ts_code = b.ts_code "
+        "WHERE b.industry=? AND d.trade_date>=?",
+        conn, params=(industry, start_date)
+    )
+
+def load_symbol_bars(conn, ts_code, start_date=None):
+    """个股日线 + 复权因子 (按交易日升序)"""
+    return pd.read_sql_query(
+        "SELECT d.*, a.adj_factor FROM daily d "
+        "LEFT JOIN adj_factor a ON d.ts_code = a.ts_code AND d.trade_date = a.trade_date "
+        "WHERE d.ts_code=? AND d.trade_date>=? ORDER BY d.trade_date",
+        conn, params=(ts_code, start_date or "")
+    )
+
+def get_symbol_bar_version(conn, ts_code):
+    """(最新K线日期, 最新复权因子)：任一变化即说明该标的的复权序列需要重算"""
+    row = conn.execute(
+        "SELECT d.trade_date, a.adj_factor FROM daily d "
+        "LEFT JOIN adj_factor a ON d.ts_code = a.ts_code AND d.trade_date = a.trade_date "
+        "WHERE d.ts_code=? ORDER BY d.trade_date DESC LIMIT 1", (ts_code,)
+    ).fetchone()
+    return tuple(row) if row else (None, None)
+
+def expected_latest_trade_date(now=None, conn=None):
+    """
+    本地数据应当同步到的交易日：16:00 后为当天，否则为前一天，再回退到最近的开市日
+    有同步过的交易日历 (meta) 时按日历跳过节假日；日历未覆盖时退化为只跳过周末
+    """
+    now = now or datetime.now()
+    d = (now if now.hour >= 16 else now - timedelta(days=1)).strftime('%Y%m%d')
+    if conn is not None:
+        try:
+            opened = (get_meta(conn, 'trade_cal_open') or "").split(',')
+            until = get_meta(conn, 'trade_cal_until') or ""
+            if opened[0] and opened[0] <= d <= until:
+                return opened[bisect.bisect_right(opened, d) - 1]
+        except sqlite3.Error:
+            pass
+    d = datetime.strptime(d, '%Y%m%d')
+    while d.weekday() >= 5: d -= timedelta(days=1)
+    return d.strftime('%Y%m%d')
+
+def load_market_snapshot(conn, trade_date=None):
+    """全市场某日快照 (估值 + 涨跌幅 + 行业)，默认取两张表都已同步的最新交易日"""
+    if trade_date is None:
+        row = conn.execute("SELECT MAX(trade_date) FROM daily_basic WHERE trade_date IN (SELECT DISTINCT trade_date FROM daily)").fetchone()
+        trade_date = row[0]
+    if not trade_date: return pd.DataFrame()
+    return pd.read_sql_query(
+        "SELECT b.ts_code, b.trade_date, s.industry, b.pe_ttm, b.pb, b.total_mv, b.turnover_rate, d.pct_chg "
+        "FROM daily_basic b "
+        "JOIN stock_basic s ON b.ts_code = s.ts_code "
+        "LEFT JOIN daily d ON b.ts_code = d.ts_code AND b.trade_date = d.trade_date "
+        "WHERE b.trade_date=?",
+        conn, params=(trade_date,)
+    )
+
+def get_symbol_industry(conn, ts_code):
+    row = conn.execute("SELECT industry FROM stock_basic WHERE ts_code=?", (ts_code,)).fetchone()
+    return row[0] if row else None
+
+# ===================== 命令行同步入口 =====================
+
+def run_sync(years=10, sleep=0.0):
+    from data_utils import get_tushare_pro
+    from peer_utils import refresh_industry_stats
+    pro = get_tushare_pro()
+    if not pro:
+        print("Token无效，无法同步")
+        return
+    def progress(table, i, n, d):
+        if i % 50 == 0 or i == n: print(f"[{table}] {i}/{n} {d}")
+    conn = get_store_conn()
+    try:
+        print(f"trade_cal: {sync_trade_cal(pro, conn)} 个开市日")
+        print(f"stock_basic: {sync_stock_basic(pro, conn)} 条")
+        print(f"daily_basic: {sync_daily_basic(pro, conn, years=years, sleep=sleep, progress=progress)} 条")
+        print(f"daily: {sync_daily(pro, conn, years=years, sleep=sleep, progress=progress)} 条")
+        n, changed = sync_adj_factor(pro, conn, years=years, sleep=sleep, progress=progress)
+        print(f"adj_factor: {n} 条，除权除息标的 {len(changed)} 只")
+        print(f"industry_stats: {refresh_industry_stats(conn)} 个行业")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="批量同步本地行情库")
+    parser.add_argument("--years", type=int, default=10, help="回补年数")
+    parser.add_argument("--sleep", type=float, default=0.0, help="每次请求间隔(秒)，用于限频")
+    args = parser.parse_args()
+    run_sync(args.years, args.sleep)
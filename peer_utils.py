@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from local_store import get_store_conn, load_market_snapshot, get_meta, set_meta
+
+# ===================== 行业同业对比 =====================
+# 每日收盘后用全市场快照 + 行业映射，一次 groupby 算出各行业分位数与个股行业内排名并落盘；
+# 报告生成时只读本地结果，不再额外请求接口。
+
+PEER_METRICS = ['pe_ttm', 'pb', 'total_mv', 'turnover_rate', 'pct_chg']
+# 数值越大排名越靠前的指标 (其余为越小越靠前，即低估值排前)
+DESC_METRICS = ['total_mv', 'turnover_rate', 'pct_chg']
+QUANTILES = {0.25: 'p25', 0.5: 'median', 0.75: 'p75'}
+
+# (版本, 快照) 整体替换；版本 = (最新交易日, 最近一次计算时间)，同日重算也会失效
+_peer_cache = (None, {"trade_date": None, "stats": None, "ranks": None})
+_peer_lock = threading.Lock()
+
+def compute_industry_stats(snapshot):
+    """
+    snapshot: ts_code, industry + PEER_METRICS
+    返回 (stats, ranks)
+      stats: industry, metric, peers (该指标有效的股票数), p25, median, p75
+      ranks: ts_code, industry, peers (行业股票总数), {metric}_rank
+    """
+    df = snapshot.dropna(subset=['industry']).reset_index(drop=True)
+    values = df[PEER_METRICS].astype(float)
+    # 亏损 / 负资产的估值没有可比性
+    values[['pe_ttm', 'pb']] = values[['pe_ttm', 'pb']].where(values[['pe_ttm', 'pb']] > 0)
+
+    g = values.groupby(df['industry'])
+    q = g.quantile(list(QUANTILES)).rename_axis(['industry', 'q']).stack().unstack('q')
+    q.columns = [QUANTILES[c] for c in q.columns]
+    counts = g.count().stack().rename('peers')
+    stats = q.join(counts).rename_axis(['industry', 'metric']).reset_index()
+
+    keys = values.copy()
+    keys[DESC_METRICS] = -keys[DESC_METRICS]
+    ranks = keys.groupby(df['industry']).rank(method='min').add_suffix('_rank')
+    ranks.insert(0, 'peers', g['pct_chg'].transform('size'))
+    ranks.insert(0, 'industry', df['industry'])
+    ranks.insert(0, 'ts_code', df['ts_code'])
+    return stats, ranks
+
+def refresh_industry_stats(conn, trade_date=None):
+    """计算并落盘某交易日的行业统计 (重复执行会覆盖当日结果)，返回行业数"""
+    snapshot = load_market_snapshot(conn, trade_date)
+    if snapshot.empty: return 0
+    trade_date = snapshot['trade_date'].iloc[0]
+    stats, ranks = compute_industry_stats(snapshot)
+
+    stats.insert(0, 'trade_date', trade_date)
+    ranks.insert(0, 'trade_date', trade_date)
+    conn.execute("DELETE FROM industry_stats WHERE trade_date=?", (trade_date,))
+    conn.execute("DELETE FROM peer_rank WHERE trade_date=?", (trade_date,))
+    for table, df in (('industry_stats', stats), ('peer_rank', ranks)):
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})", rows
+        )
+    set_meta(conn, 'industry_stats_refreshed_at', datetime.now().strftime('%Y%m%d%H%M%S%f'))
+    conn.commit()
+    return stats['industry'].nunique()
+
+def _load_latest(conn):
+    global _peer_cache
+    row = conn.execute("SELECT MAX(trade_date) FROM peer_rank").fetchone()
+    version = (row[0], get_meta(conn, 'industry_stats_refreshed_at'))
+    cached_version, snapshot = _peer_cache
+    if version == cached_version: return snapshot
+    with _peer_lock:
+        if _peer_cache[0] == version: return _peer_cache[1]
+        trade_date = version[0]
+        stats = pd.read_sql_query("SELECT * FROM industry_stats WHERE trade_date=?", conn, params=(trade_date,))
+        ranks = pd.read_sql_query("SELECT * FROM peer_rank WHERE trade_date=?", conn, params=(trade_date,))
+        snapshot = {
+            "trade_date": trade_date,
+            "stats": stats.set_index(['industry', 'metric']),
+            "ranks": ranks.set_index('ts_code'),
+        }
+        # 读方拿到的总是同一版本的 stats / ranks
+        _peer_cache = (version, snapshot)
+    return snapshot
+
+def get_peer_context(ts_code, conn=None):
+    """个股在所属行业内的位置；本地无数据时返回 None"""
+    if ts_code.endswith('.HK'): return None
+    own = conn is None
+    try:
+        if own: conn = get_store_conn(readonly=True)
+        if conn is None: return None
+        cache = _load_latest(conn)
+        ranks, stats = cache["ranks"], cache["stats"]
+        if ranks is None or ts_code not in ranks.index: return None
+
+        r = ranks.loc[ts_code]
+        industry = r['industry']
+        ctx = {"trade_date": cache["trade_date"], "industry": industry, "peers": int(r['peers'])}
+        for m in PEER_METRICS:
+            rank = r[f'{m}_rank']
+            ctx[f'{m}_rank'] = int(rank) if pd.notna(rank) else None
+            if (industry, m) in stats.index:
+                s = stats.loc[(industry, m)]
+                ctx[f'{m}_median'] = s['median']
+                ctx[f'{m}_p25'] = s['p25']
+                ctx[f'{m}_p75'] = s['p75']
+                # 排名只在该指标有效的股票中计算 (亏损股不参与 PE 排名)，分母用有效数而非行业总数
+                ctx[f'{m}_peers'] = int(s['peers'])
+        return ctx
+    except Exception as e:
+        print(f"Peer Context Error: {e}")
+        return None
+    finally:
+        if own and conn is not None: conn.close()
+
+def format_rank(ctx, metric):
+    if not ctx or ctx.get(f'{metric}_rank') is None: return "N/A"
+    return f"{ctx[f'{metric}_rank']}/{ctx.get(f'{metric}_peers', ctx['peers'])}"
+
+def format_median(ctx, metric, scale=1, unit=""):
+    v = (ctx or {}).get(f'{metric}_median')
+    if v is None or not np.isfinite(v): return "N/A"
+    return f"{v / scale:.2f}{unit}"
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+from data_utils import (
+    validate_stock_code,
+    get_stock_name_by_code,
+    get_clean_market_data,
+    get_clean_fundamental_data,
+    get_market_environment_data,
+)
+from core_logic import (
+    call_deepseek_api,
+    generate_analysis_prompt,
+    generate_comparison_prompt,
+    min_comparison_budget,
+    COMPARE_TOKEN_BUDGET,
+)
+
+# ===================== 无界面分析流程 =====================
+# 与 app.py 中"生成投研报告"按钮相同的流程，供 CLI / 定时任务 / 其他服务直接调用。
+
+def analyze_stock(code, style="稳健理智", predict_cycle="次日波动", with_ai=True, stock_name=None, mkt_data=None):
+    """
+    返回 {"代码", "名称", "风格", "周期", "分析时间", "行情", "基本面", "市场环境", "AI分析报告"}
+    出错时返回 {"代码": code, "错误": ...}
+    mkt_data 可由调用方传入 (批量时同一市场只取一次)
+    """
+    is_valid, ts_code = validate_stock_code(code)
+    if not is_valid: return {"代码": code, "错误": ts_code}
+
+    daily_data = get_clean_market_data(ts_code)
+    if "错误" in daily_data: return {"代码": ts_code, "错误": daily_data["错误"]}
+
+    stock_name = stock_name or get_stock_name_by_code(ts_code)
+    fund_data = get_clean_fundamental_data(ts_code, daily_data)
+    mkt_data = mkt_data or get_market_environment_data(ts_code)
+
+    report = None
+    if with_ai:
+        prompt = generate_analysis_prompt(
+            ts_code, stock_name, predict_cycle,
+            daily_data, fund_data, mkt_data,
+            style=style
+        )
+        report = call_deepseek_api(prompt)
+
+    return {
+        "代码": ts_code, "名称": stock_name, "风格": style, "周期": predict_cycle,
+        "分析时间": datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "行情": {k: v for k, v in daily_data.items() if not k.startswith('_')},
+        "基本面": fund_data,
+        "市场环境": mkt_data,
+        "AI分析报告": report
+    }
+
+def compare_stocks(codes, style="稳健理智", predict_cycle="次日波动", with_ai=True, token_budget=COMPARE_TOKEN_BUDGET):
+    """
+    多股横向对比：逐只取数后合并为一次模型调用
+    返回 {"风格", "周期", "分析时间", "标的": [...], "未纳入": [...], "错误": {...}, "AI对比报告"}
+    token_budget 低于 min_comparison_budget 时在取数前抛 ValueError
+    """
+    need = min_comparison_budget(predict_cycle, style)
+    if token_budget < need: raise ValueError(f"token 预算 {token_budget} 过小，至少需要 {need}")
+
+    # 市场环境只取决于市场 (A股 / 港股)，每个市场只取一次
+    items, errors, envs = [], {}, {}
+    for code in codes:
+        is_valid, ts_code = validate_stock_code(code)
+        if not is_valid:
+            errors[code] = ts_code
+            continue
+        hk = ts_code.endswith('.HK')
+        if hk not in envs: envs[hk] = get_market_environment_data(ts_code)
+        r = analyze_stock(ts_code, style=style, predict_cycle=predict_cycle, with_ai=False, mkt_data=envs[hk])
+        if "错误" in r: errors[r["代码"]] = r["错误"]
+        elif all(it["代码"] != r["代码"] for it in items): items.append(r)
+
+    result = {
+        "风格": style, "周期": predict_cycle,
+        "分析时间": datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "标的": items, "未纳入": [], "错误": errors, "AI对比报告": None
+    }
+    if len(items) < 2:
+        result["AI对比报告"] = "❌ 错误: 有效标的不足 2 只，无法对比。"
+        return result
+
+    prompt, packed = generate_comparison_prompt(items, predict_cycle, style=style, token_budget=token_budget)
+    result["未纳入"] = packed["omitted"]
+    if with_ai: result["AI对比报告"] = call_deepseek_api(prompt)
+    return result
+
+def to_markdown(result):
+    if "错误" in result: return f"## {result['代码']}\n\n❌ {result['错误']}\n"
+    lines = [
+        f"## {result['名称']} ({result['代码']})",
+        "",
+        f"- 分析时间：{result['分析时间']}",
+        f"- 风格 / 周期：{result['风格']} / {result['周期']}",
+        "",
+        "| 指标 | 数值 |",
+        "| --- | --- |",
+    ]
+    for section in ("行情", "基本面", "市场环境"):
+        for k, v in result[section].items(): lines.append(f"| {k} | {v} |")
+    if result.get("AI分析报告"):
+        lines += ["", "### AI 分析报告", "", result["AI分析报告"]]
+    return "\n".join(lines) + "\n"
+
+def comparison_to_markdown(result):
+    lines = [
+        f"## 多股对比 ({len(result['标的'])} 只)",
+        "",
+        f"- 分析时间：{result['分析时间']}",
+        f"- 风格 / 周期：{result['风格']} / {result['周期']}",
+        "",
+        "| 代码 | 名称 | 收盘 | 涨跌 | PE | PB | RSI | 行业 |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for it in result["标的"]:
+        d, f = it["行情"], it["基本面"]
+        lines.append(f"| {it['代码']} | {it['名称']} | {d.get('收盘价')} | {d.get('涨跌幅')} | "
+                     f"{f.get('PE(TTM)')} | {f.get('PB')} | {d.get('RSI')} | {f.get('所属行业')} |")
+    if result["未纳入"]: lines += ["", f"超出 token 预算未纳入对比：{', '.join(result['未纳入'])}"]
+    for code, err in result["错误"].items(): lines.append(f"\n❌ {code}: {err}")
+    if result.get("AI对比报告"):
+        lines += ["", "### AI 对比报告", "", result["AI对比报告"]]
+    return "\n".join(lines) + "\n"
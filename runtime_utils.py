@@ -0,0 +1,18 @@
+import os
+import sys
+
+# ===================== 运行环境适配 =====================
+# 数据层 / AI 层既要跑在 Streamlit 里，也要能作为普通库被 CLI、定时任务直接 import。
+# 只有当 streamlit 已被宿主加载时才读取它的 secrets，否则退化为环境变量，
+# 避免无界面场景为 import streamlit 付出启动开销。行情数据缓存见 frame_cache.py。
+
+def _streamlit():
+    return sys.modules.get("streamlit")
+
+def get_config_value(key, default=""):
+    st = _streamlit()
+    if st is not None:
+        try:
+            if key in st.secrets: return st.secrets[key]
+        except Exception: pass
+    return os.getenv(key, default)
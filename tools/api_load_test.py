@@ -0,0 +1,109 @@
+"""
+API 服务压测：全部依赖替换为本地替身，不消耗 Tushare / 模型额度。
+
+    python tools/api_load_test.py --requests 2000 --concurrency 200
+    python tools/api_load_test.py --mix quote --pro-latency 0.05
+
+进程内依次启动：假 Chat 服务 -> api_server (pro_api 替换为 FakePro) -> aiohttp 客户端并发打流量，
+输出吞吐与 p50/p95/p99 延迟。
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web, ClientSession, TCPConnector, ClientTimeout
+
+from fake_services import FakePro, make_fake_llm_app
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def _start(app, port):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+def _pct(values, p):
+    if not values: return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def main(args):
+    llm_port, api_port = _free_port(), _free_port()
+    # core_logic 在导入时读取配置，需先设置环境变量再导入 api_server
+    os.environ.update(ARK_API_URL=f"http://127.0.0.1:{llm_port}", ARK_API_KEY="fake", ARK_MODEL_ENDPOINT="fake-ep")
+    llm_runner = await _start(make_fake_llm_app(ttft=args.llm_ttft, token_interval=args.llm_token_interval), llm_port)
+
+    import data_utils
+    fake = FakePro(latency=args.pro_latency, n_symbols=args.symbols)
+    data_utils.get_tushare_pro = lambda: fake
+    import api_server
+    api_runner = await _start(api_server.create_app(), api_port)
+
+    base = f"http://127.0.0.1:{api_port}"
+    codes = [c[:6] for c in fake.codes]
+    kinds = {"quote": ["quote"], "report": ["report"], "stream": ["stream"],
+             "mixed": ["quote"] * 6 + ["search"] * 2 + ["report", "stream"]}[args.mix]
+
+    latencies = {k: [] for k in ("quote", "search", "report", "stream")}
+    errors = {}
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(session, i):
+        kind = random.choice(kinds)
+        code = random.choice(codes)
+        async with sem:
+            t = time.perf_counter()
+            try:
+                if kind == "quote":
+                    r = await session.get(f"{base}/api/quote", params={"code": code})
+                elif kind == "search":
+                    r = await session.get(f"{base}/api/search", params={"q": code[:4]})
+                elif kind == "report":
+                    r = await session.post(f"{base}/api/report", json={"code": code})
+                else:
+                    r = await session.post(f"{base}/api/report/stream", json={"code": code})
+                await r.read()
+                if r.status != 200: errors[r.status] = errors.get(r.status, 0) + 1
+                else: latencies[kind].append(time.perf_counter() - t)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    t0 = time.perf_counter()
+    async with ClientSession(connector=TCPConnector(limit=args.concurrency), timeout=ClientTimeout(total=300)) as session:
+        await asyncio.gather(*(one(session, i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - t0
+
+    print(f"请求 {args.requests}，并发 {args.concurrency}，耗时 {elapsed:.2f}s，吞吐 {args.requests / elapsed:.1f} req/s")
+    print(f"{'接口':<8}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'mean(ms)':>10}")
+    for kind, vals in latencies.items():
+        if not vals: continue
+        print(f"{kind:<8}{len(vals):>8}{_pct(vals, 50) * 1000:>10.1f}{_pct(vals, 95) * 1000:>10.1f}"
+              f"{_pct(vals, 99) * 1000:>10.1f}{statistics.mean(vals) * 1000:>10.1f}")
+    if errors: print(f"错误: {errors}")
+
+    await api_runner.cleanup()
+    await llm_runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API 服务本地压测")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--mix", default="mixed", choices=["mixed", "quote", "report", "stream"])
+    parser.add_argument("--symbols", type=int, default=300, help="替身股票池大小 (影响缓存命中率)")
+    parser.add_argument("--pro-latency", type=float, default=0.03, help="每次 Tushare 调用的模拟延迟(秒)")
+    parser.add_argument("--llm-ttft", type=float, default=0.2, help="假模型首包延迟(秒)")
+    parser.add_argument("--llm-token-interval", type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
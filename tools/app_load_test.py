@@ -0,0 +1,238 @@
+"""
+Streamlit 页面并发压测：用 streamlit.testing 驱动 N 个模拟会话走完真实的 run_app 流程
+(输入代码 -> 生成投研报告 -> 历史记录导出)，Tushare 与模型服务均为本地替身，不消耗额度。
+
+    python tools/app_load_test.py --concurrency 1,2,4,8,16 --sessions 16
+    python tools/app_load_test.py --concurrency 8 --rounds 3 --cache-mb 0
+
+每档并发依次输出：吞吐 (完成报告数/秒)、各步骤 p50/p95/p99 延迟、CPU 占用 (进程 CPU 时间 / 墙钟)、
+常驻内存 (当前 RSS 与峰值)。所有会话跑在同一进程的线程里，与 `streamlit run` 单进程多会话的模型一致。
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+from fake_services import FakePro, make_fake_llm_app
+
+APP_FILE = os.path.join(ROOT, "app.py")
+STEPS = ("open", "code", "analyze", "export")
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _pct(values, p):
+    if not values: return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def _rss_mb():
+    """当前常驻内存 (MB)，读 /proc；非 Linux 返回 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def _cpu_seconds():
+    r = resource.getrusage(resource.RUSAGE_SELF)
+    return r.ru_utime + r.ru_stime
+
+def start_fake_llm(args):
+    """假 Chat 服务跑在独立线程的事件循环里，返回端口"""
+    port = _free_port()
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(make_fake_llm_app(ttft=args.llm_ttft, tokens=args.llm_tokens, token_interval=args.llm_token_interval))
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name="fake-llm", daemon=True).start()
+    ready.wait()
+    return port
+
+def share_test_runtime():
+    """
+    AppTest 按单线程测试设计，多线程并发时有两处冲突，这里改成与真实服务一致的共享方式：
+      - 每次运行都改写全局单例 Runtime._instance 并在结束时置空，会互相清掉对方的运行时
+        (表现为下载按钮 / 图表渲染失败)：让 Runtime.instance() 固定返回一份共享的模拟运行时
+      - 每次运行新建 ScriptCache 重新编译 app.py，并发 ast.parse 在 Python 3.11 上会报
+        "AST constructor recursion depth mismatch"：所有会话共用一份编译缓存
+    """
+    from unittest.mock import MagicMock
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    shared_cache, get_bytecode = ScriptCache(), ScriptCache.get_bytecode
+    ScriptCache.get_bytecode = lambda self, script_path: get_bytecode(shared_cache, script_path)
+
+def run_session(codes, rounds, timeout):
+    """
+    一个会话：打开页面 -> 每轮输入代码并生成报告 -> 检查历史记录表与 CSV 导出按钮
+    返回 ({步骤: [耗时]}, 错误信息或 None)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    timings = {k: [] for k in STEPS}
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    # 跳过密码页，直接进入 run_app
+    at.session_state["password_correct"] = True
+
+    t = time.perf_counter()
+    at.run()
+    timings["open"].append(time.perf_counter() - t)
+    if at.exception: return timings, f"打开页面异常: {at.exception[0].message}"
+
+    for i, code in enumerate(codes[:rounds]):
+        t = time.perf_counter()
+        box = next((w for w in at.text_input if w.label == "代码"), None)
+        if box is None: return timings, "缺少代码输入框"
+        box.input(code).run()
+        timings["code"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        btn = next((b for b in at.button if b.label.startswith("🚀")), None)
+        if btn is None: return timings, "缺少生成报告按钮"
+        btn.click().run()
+        timings["analyze"].append(time.perf_counter() - t)
+        if at.exception: return timings, f"分析异常: {at.exception[0].message}"
+        errors = [e.value for e in at.error]
+        if errors: return timings, f"页面报错: {errors[0]}"
+        if len(at.session_state.history_data) != i + 1: return timings, "历史记录未写入"
+
+        # 导出：历史区的 CSV 在每次渲染时生成，这里再触发一次渲染并确认下载按钮存在
+        t = time.perf_counter()
+        at.run()
+        timings["export"].append(time.perf_counter() - t)
+        if not at.get("download_button"): return timings, "缺少 CSV 下载按钮"
+
+    return timings, None
+
+def run_level(concurrency, sessions, rounds, pool, timeout):
+    timings = {k: [] for k in STEPS}
+    errors = {}
+
+    def one(i):
+        # 每个会话从股票池里取不同的起点，模拟不同用户看不同标的
+        start = (i * rounds) % len(pool)
+        return run_session((pool[start:] + pool[:start]), rounds, timeout)
+
+    cpu0, t0 = _cpu_seconds(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as ex:
+        for result, err in ex.map(one, range(sessions)):
+            for k, v in result.items(): timings[k].extend(v)
+            if err: errors[err] = errors.get(err, 0) + 1
+    elapsed = time.perf_counter() - t0
+    cpu = _cpu_seconds() - cpu0
+
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        # 走到导出一步的才算完成一份报告
+        "reports": len(timings["export"]),
+        "timings": timings,
+        "errors": errors,
+        "cpu": cpu / elapsed if elapsed else 0.0,
+        "rss": _rss_mb(),
+        "peak_rss": _peak_rss_mb(),
+    }
+
+def print_level(r):
+    print(f"\n并发 {r['concurrency']}：耗时 {r['elapsed']:.2f}s，完成报告 {r['reports']}，"
+          f"吞吐 {r['reports'] / r['elapsed']:.2f} 报告/s，CPU {r['cpu'] * 100:.0f}%，"
+          f"RSS {r['rss'] or 0:.0f} MB (峰值 {r['peak_rss']:.0f} MB)")
+    print(f"{'步骤':<8}{'次数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'mean(ms)':>10}")
+    for step, vals in r["timings"].items():
+        if not vals: continue
+        print(f"{step:<8}{len(vals):>6}{_pct(vals, 50) * 1000:>10.0f}{_pct(vals, 95) * 1000:>10.0f}"
+              f"{_pct(vals, 99) * 1000:>10.0f}{statistics.mean(vals) * 1000:>10.0f}")
+    if r["errors"]: print(f"错误: {r['errors']}")
+
+def main(args):
+    # 配置在导入时读取，必须先设置环境变量再导入 app 依赖的模块
+    llm_port = start_fake_llm(args)
+    os.environ.update(ARK_API_URL=f"http://127.0.0.1:{llm_port}", ARK_API_KEY="fake", ARK_MODEL_ENDPOINT="fake-ep")
+    if args.cache_mb is not None: os.environ["MARKET_CACHE_MB"] = str(args.cache_mb)
+
+    # AppTest 在非 Streamlit 线程里运行，屏蔽 missing ScriptRunContext 之类的告警
+    from streamlit import logger
+    logger.set_log_level("error")
+    share_test_runtime()
+
+    import data_utils
+    fake = FakePro(latency=args.pro_latency, n_symbols=args.symbols)
+    # app.py 每次渲染都会重新 from data_utils import，替换模块属性即可生效
+    data_utils.get_tushare_pro = lambda: fake
+    pool = [c[:6] for c in fake.codes]
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    print(f"股票池 {len(pool)}，每档会话 {args.sessions or '=并发数'}，每会话 {args.rounds} 份报告，"
+          f"Tushare 延迟 {args.pro_latency * 1000:.0f}ms，模型首包 {args.llm_ttft * 1000:.0f}ms，"
+          f"起始 RSS {_rss_mb() or 0:.0f} MB")
+
+    results = []
+    for c in levels:
+        r = run_level(c, args.sessions or c, args.rounds, pool, args.timeout)
+        print_level(r)
+        results.append(r)
+
+    if len(results) > 1:
+        print(f"\n{'并发':>6}{'报告/s':>10}{'analyze p50':>14}{'analyze p95':>14}{'CPU':>8}{'RSS(MB)':>10}")
+        for r in results:
+            a = r["timings"]["analyze"]
+            print(f"{r['concurrency']:>6}{r['reports'] / r['elapsed']:>10.2f}{_pct(a, 50) * 1000:>12.0f}ms"
+                  f"{_pct(a, 95) * 1000:>12.0f}ms{r['cpu'] * 100:>7.0f}%{r['rss'] or 0:>10.0f}")
+
+    from frame_cache import get_market_cache_stats
+    cs = get_market_cache_stats()
+    print(f"\n行情缓存: {cs['entries']} 项，{cs['bytes'] / 1048576:.1f} MB，命中率 {cs['hit_rate']:.0%}，淘汰 {cs['evictions']}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streamlit 页面并发会话压测")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="逗号分隔的并发档位，如 1,2,4,8,16")
+    parser.add_argument("--sessions", type=int, default=0, help="每档总会话数 (默认等于并发数)")
+    parser.add_argument("--rounds", type=int, default=2, help="每个会话生成的报告数")
+    parser.add_argument("--symbols", type=int, default=50, help="替身股票池大小 (影响缓存命中率)")
+    parser.add_argument("--cache-mb", type=float, default=None, help="覆盖 MARKET_CACHE_MB，0 表示不缓存")
+    parser.add_argument("--pro-latency", type=float, default=0.03, help="每次 Tushare 调用的模拟延迟(秒)")
+    parser.add_argument("--llm-ttft", type=float, default=0.5, help="假模型首包延迟(秒)")
+    parser.add_argument("--llm-tokens", type=int, default=40)
+    parser.add_argument("--llm-token-interval", type=float, default=0.005)
+    parser.add_argument("--timeout", type=float, default=120, help="单次页面渲染超时(秒)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ===================== 离线替身 =====================
+# 压测 / 联调时替代 Tushare pro_api 与火山引擎 Chat 接口，不消耗真实额度。
+# FakePro 按代码生成确定性的随机行情，并可模拟网络延迟；
+# make_fake_llm_app 返回一个 OpenAI 兼容的 /chat/completions 服务，可注入首包延迟、慢请求与故障。
+
+@functools.lru_cache(maxsize=8)
+def _trade_dates(days):
+    end = datetime.now()
+    dates = [(end - timedelta(days=i)) for i in range(days)]
+    return tuple(d.strftime('%Y%m%d') for d in reversed(dates) if d.weekday() < 5)
+
+class FakePro:
+    def __init__(self, latency=0.0, n_symbols=300):
+        self.latency = latency
+        self.codes = [f"{600000 + i:06d}.SH" for i in range(n_symbols // 2)] + \
+                     [f"{i:06d}.SZ" for i in range(1, n_symbols - n_symbols // 2 + 1)]
+        self.industries = ["银行", "白酒", "半导体", "医药", "汽车", "电力"]
+
+    def _wait(self):
+        if self.latency: time.sleep(self.latency * random.uniform(0.5, 1.5))
+
+    def _rng(self, key):
+        return np.random.default_rng(zlib.crc32(key.encode()))
+
+    @functools.lru_cache(maxsize=4096)
+    def _full_bars(self, ts_code):
+        full = _trade_dates(4000)
+        rng = self._rng(ts_code)
+        ret = rng.normal(0.0003, 0.02, len(full))
+        close = 20 * np.exp(np.cumsum(ret))
+        pre = np.concatenate([[close[0]], close[:-1]])
+        return pd.DataFrame({
+            'ts_code': ts_code, 'trade_date': full,
+            'open': pre * (1 + ret / 2), 'high': np.maximum(close, pre) * 1.01, 'low': np.minimum(close, pre) * 0.99,
+            'close': close, 'pre_close': pre, 'pct_chg': (close / pre - 1) * 100,
+            'vol': rng.uniform(1e4, 1e6, len(full)), 'amount': rng.uniform(1e5, 1e7, len(full)),
+        })
+
+    def _bars(self, ts_code, start_date, end_date):
+        df = self._full_bars(ts_code)
+        df = df[(df['trade_date'] >= start_date) & (df['trade_date'] <= end_date)]
+        return df.iloc[::-1].reset_index(drop=True)
+
+    @functools.cached_property
+    def _basic(self):
+        return pd.DataFrame({
+            'ts_code': self.codes,
+            'name': [f"测试{c[:6]}" for c in self.codes],
+            'industry': [self.industries[i % len(self.industries)] for i in range(len(self.codes))],
+        })
+
+    def stock_basic(self, ts_code=None, fields=None, **kw):
+        self._wait()
+        df = self._basic
+        if ts_code: df = df[df['ts_code'] == ts_code]
+        return df.reset_index(drop=True)
+
+    def hk_basic(self, ts_code=None, **kw):
+        self._wait()
+        return pd.DataFrame({'ts_code': [ts_code or '00700.HK'], 'name': ['测试港股'], 'industry': ['港股']})
+
+    def daily(self, ts_code=None, start_date='', end_date='99999999', trade_date=None, **kw):
+        self._wait()
+        if trade_date:
+            return pd.concat([self._bars(c, trade_date, trade_date) for c in self.codes], ignore_index=True)
+        return self._bars(ts_code, start_date, end_date)
+
+    def hk_daily(self, ts_code=None, start_date='', end_date='99999999', **kw):
+        return self.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+    def daily_basic(self, ts_code=None, start_date='', end_date='99999999', trade_date=None, **kw):
+        self._wait()
+        codes = [ts_code] if ts_code else self.codes
+        dates = [trade_date] if trade_date else [d for d in _trade_dates(40) if start_date <= d <= end_date]
+        rows = []
+        for c in codes:
+            rng = self._rng(c)
+            pe, pb = rng.uniform(5, 60), rng.uniform(0.5, 8)
+            for d in dates:
+                rows.append({'ts_code': c, 'trade_date': d, 'close': 20.0, 'turnover_rate': rng.uniform(0.2, 5),
+                             'pe_ttm': pe * rng.uniform(0.9, 1.1), 'pb': pb * rng.uniform(0.9, 1.1),
+                             'total_mv': rng.uniform(1e5, 1e7)})
+        return pd.DataFrame(rows)
+
+    def index_daily(self, ts_code=None, start_date='', end_date='99999999', **kw):
+        self._wait()
+        return self._bars(ts_code, start_date, end_date)
+
+    def trade_cal(self, start_date='', end_date='99999999', **kw):
+        return pd.DataFrame({'cal_date': [d for d in _trade_dates(4000) if start_date <= d <= end_date]})
+
+    def adj_factor(self, trade_date=None, **kw):
+        self._wait()
+        return pd.DataFrame({'ts_code': self.codes, 'trade_date': trade_date, 'adj_factor': 1.0})
+
+# ===================== 假 Chat 接口 =====================
+
+FAKE_REPORT = "1. **走势研判**：测试报告，仅用于压测。\n2. **风险提示**：数据为离线替身生成。\n"
+
+def make_fake_llm_app(ttft=0.05, tokens=40, token_interval=0.005, slow_rate=0.0, slow_ttft=5.0, fault_rate=0.0):
+    """
+    OpenAI 兼容的假服务：
+      ttft         首个 token 延迟(秒)
+      slow_rate    以该概率把首包延迟拉长到 slow_ttft (模拟长尾)
+      fault_rate   以该概率直接返回 500
+    app["stats"] 记录请求数 / 被客户端中途断开(取消)数
+    """
+    from aiohttp import web
+
+    stats = {"requests": 0, "faults": 0, "slow": 0, "cancelled": 0, "completed": 0}
+
+    async def completions(request):
+        stats["requests"] += 1
+        body = await request.json()
+        if random.random() < fault_rate:
+            stats["faults"] += 1
+            return web.json_response({"error": {"message": "injected fault"}}, status=500)
+        delay = ttft
+        if random.random() < slow_rate:
+            stats["slow"] += 1
+            delay = slow_ttft
+        step = max(1, len(FAKE_REPORT) // tokens)
+        pieces = [FAKE_REPORT[i:i + step] for i in range(0, len(FAKE_REPORT), step)]
+        base = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "fake")}
+
+        try:
+            await asyncio.sleep(delay)
+            if not body.get("stream"):
+                await asyncio.sleep(token_interval * len(pieces))
+                stats["completed"] += 1
+                return web.json_response({
+                    "id": "fake", "object": "chat.completion", "created": base["created"], "model": base["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": FAKE_REPORT}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)},
+                })
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for p in pieces:
+                chunk = dict(base, choices=[{"index": 0, "delta": {"content": p}, "finish_reason": None}])
+                await resp.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                await asyncio.sleep(token_interval)
+            await resp.write(b"data: [DONE]\n\n")
+            stats["completed"] += 1
+            return resp
+        except ConnectionResetError:
+            # 客户端中途断开 (对冲中被取消的一路)
+            stats["cancelled"] += 1
+            return web.Response(status=499)
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", completions)
+    app["stats"] = stats
+    return app
@@ -0,0 +1,119 @@
+"""
+模型对冲 / 故障切换验证：两个本地假 Chat 服务，主接入点注入长尾延迟与故障，备用接入点正常。
+分别在关闭 / 开启对冲的情况下顺序 (或并发) 调用，对比延迟分位与失败数。
+
+    python tools/hedge_check.py --calls 200 --slow-rate 0.05 --fault-rate 0.03
+
+最后检查长生成 (首 token 快、整段输出远超对冲阈值)：不应触发对冲，否则返回码为 1。
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+from fake_services import make_fake_llm_app
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def _start(app, port):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def _run(llm_client, calls, concurrency, stream):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, failed = [], 0
+
+    async def one():
+        nonlocal failed
+        async with sem:
+            t = time.perf_counter()
+            if stream:
+                text = "".join([p async for p in llm_client.hedged_stream("ping")])
+            else:
+                text = await llm_client.hedged_call("ping")
+            if text.startswith("API调用失败") or "API调用失败" in text: failed += 1
+            else: latencies.append(time.perf_counter() - t)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failed
+
+async def main(args):
+    p1, p2 = _free_port(), _free_port()
+    primary = make_fake_llm_app(ttft=args.ttft, slow_rate=args.slow_rate, slow_ttft=args.slow_ttft, fault_rate=args.fault_rate)
+    backup = make_fake_llm_app(ttft=args.ttft)
+    runners = [await _start(primary, p1), await _start(backup, p2)]
+
+    os.environ.update(
+        ARK_API_URL=f"http://127.0.0.1:{p1}", ARK_API_KEY="fake", ARK_MODEL_ENDPOINT="fake-primary",
+        ARK_FALLBACK_ENDPOINTS=f"http://127.0.0.1:{p2}|fake-backup", ARK_HEDGE_DELAY=str(args.default_delay),
+    )
+    import llm_client
+
+    print(f"{'模式':<10}{'成功':>6}{'失败':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for label, hedge, failover in (("单接入点", False, False), ("仅切换", False, True), ("对冲+切换", True, True)):
+        llm_client.HEDGE_ENABLED = hedge
+        llm_client.ENDPOINTS = llm_client.parse_endpoints(
+            "fake-primary", f"http://127.0.0.1:{p1}", "fake",
+            f"http://127.0.0.1:{p2}|fake-backup" if failover else ""
+        )
+        llm_client._ttft_samples.clear()
+        for s in (primary["stats"], backup["stats"]): s.update(requests=0, faults=0, slow=0, cancelled=0, completed=0)
+
+        lat, failed = await _run(llm_client, args.calls, args.concurrency, args.stream)
+        if lat:
+            print(f"{label:<10}{len(lat):>6}{failed:>6}{_pct(lat, 50) * 1000:>10.0f}{_pct(lat, 95) * 1000:>10.0f}"
+                  f"{_pct(lat, 99) * 1000:>10.0f}{max(lat) * 1000:>10.0f}")
+        else:
+            print(f"{label:<10}{0:>6}{failed:>6}")
+        print(f"    主: {primary['stats']}  备: {backup['stats']}  对冲阈值: {llm_client.get_hedge_delay() * 1000:.0f}ms")
+
+    print(f"统计: {llm_client.get_llm_stats()}")
+
+    # 长生成：首 token 很快但整段生成远超对冲阈值，非流式调用也不应发备份请求
+    p3 = _free_port()
+    long_primary = make_fake_llm_app(ttft=args.ttft, tokens=60, token_interval=args.long_gen / 60)
+    runners.append(await _start(long_primary, p3))
+    llm_client.HEDGE_ENABLED = True
+    llm_client.ENDPOINTS = llm_client.parse_endpoints("fake-primary", f"http://127.0.0.1:{p3}", "fake", f"http://127.0.0.1:{p2}|fake-backup")
+    llm_client._ttft_samples.clear()
+    backup["stats"].update(requests=0)
+    hedged_before = llm_client.get_llm_stats()["hedged"]
+    lat, failed = await _run(llm_client, args.long_calls, args.concurrency, False)
+    hedged = llm_client.get_llm_stats()["hedged"] - hedged_before
+    ok = hedged == 0 and backup["stats"]["requests"] == 0 and failed == 0
+    print(f"长生成 ({args.long_gen:.1f}s, 对冲阈值 {llm_client.get_hedge_delay() * 1000:.0f}ms)：{len(lat)} 次，"
+          f"对冲 {hedged}，备用请求 {backup['stats']['requests']}，失败 {failed} -> {'通过' if ok else '不通过'}")
+
+    for r in runners: await r.cleanup()
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模型对冲 / 故障切换本地验证")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--ttft", type=float, default=0.1, help="正常首包延迟(秒)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="主接入点长尾请求比例")
+    parser.add_argument("--slow-ttft", type=float, default=3.0, help="长尾请求首包延迟(秒)")
+    parser.add_argument("--fault-rate", type=float, default=0.03, help="主接入点故障比例")
+    parser.add_argument("--default-delay", type=float, default=1.0, help="样本不足时的对冲阈值(秒)")
+    parser.add_argument("--stream", action="store_true", help="使用流式模式 (首 token 胜出)")
+    parser.add_argument("--long-gen", type=float, default=3.0, help="长生成检查中整段输出耗时(秒)")
+    parser.add_argument("--long-calls", type=int, default=20, help="长生成检查的调用次数")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from frame_cache import FrameCache
+from runtime_utils import get_config_value
+from local_store import (
+    get_store_conn,
+    get_store_version,
+    load_symbol_history,
+    load_industry_history,
+    get_symbol_industry,
+)
+
+# ===================== PE/PB 历史分位索引 =====================
+# 每个标的 / 行业按窗口(3/5/10年)预排好序的数组，查询当前值分位只需一次二分 O(log n)。
+# 索引放在独立的缓存里 (加锁 + 按字节封顶，不设 TTL，不与行情缓存争预算)，键中带库内最新交易日作为版本号，
+# 同步后自动失效重建，旧版本按 LRU 淘汰。大行业冷构建秒级，只在每个版本首次查询时发生一次。
+# 历史不足以覆盖窗口 (同步年数不够 / 新上市) 的分位返回 None，不用短期数据冒充长期分位。
+
+WINDOWS = (3, 5, 10)
+FIELDS = ('pe_ttm', 'pb')
+# 首条数据晚于窗口起点不超过该天数仍视为覆盖 (起点可能落在节假日)
+WINDOW_SLACK_DAYS = 15
+
+VALUATION_INDEX_MB = float(get_config_value("VALUATION_INDEX_MB", "64"))
+_index_cache = FrameCache(VALUATION_INDEX_MB * 1024 * 1024, ttl=float("inf"))
+
+def _window_start(years):
+    return (datetime.now() - timedelta(days=365 * years)).strftime('%Y%m%d')
+
+def _covers(dates, years):
+    if not len(dates): return False
+    limit = (datetime.now() - timedelta(days=365 * years - WINDOW_SLACK_DAYS)).strftime('%Y%m%d')
+    return dates[0] <= limit
+
+def _sorted_windows(dates, values):
+    """
+    dates 升序；返回 {years: 排好序的有效值数组}，剔除 NaN 与非正值(亏损/负资产)
+    历史未覆盖整个窗口时该窗口为 None
+    """
+    out = {}
+    for y in WINDOWS:
+        if not _covers(dates, y):
+            out[y] = None
+            continue
+        mask = dates >= _window_start(y)
+        v = values[mask]
+        v = v[np.isfinite(v) & (v > 0)]
+        out[y] = np.sort(v)
+        out[y].flags.writeable = False
+    return out
+
+def build_symbol_index(conn, ts_code, version=None):
+    key = ("valuation_symbol", ts_code, version)
+    entry = _index_cache.get(key)
+    if entry is not None: return entry
+    df = load_symbol_history(conn, ts_code, _window_start(max(WINDOWS)), FIELDS)
+    entry = {"latest": {}, "windows": {}}
+    if not df.empty:
+        dates = df['trade_date'].to_numpy(dtype=str)
+        for f in FIELDS:
+            values = df[f].to_numpy(dtype=float)
+            entry["latest"][f] = values[-1]
+            entry["windows"][f] = _sorted_windows(dates, values)
+    return _index_cache.put(key, entry)
+
+def build_industry_index(conn, industry, version=None):
+    """行业估值 = 每日成分股中位数，对该中位数序列做分位"""
+    key = ("valuation_industry", industry, version)
+    entry = _index_cache.get(key)
+    if entry is not None: return entry
+    df = load_industry_history(conn, industry, _window_start(max(WINDOWS)), FIELDS)
+    entry = {"latest": {}, "windows": {}}
+    if not df.empty:
+        for f in FIELDS:
+            df.loc[df[f] <= 0, f] = np.nan
+        med = df.groupby('trade_date')[list(FIELDS)].median().sort_index()
+        dates = med.index.to_numpy(dtype=str)
+        for f in FIELDS:
+            values = med[f].to_numpy(dtype=float)
+            entry["latest"][f] = values[-1]
+            entry["windows"][f] = _sorted_windows(dates, values)
+    return _index_cache.put(key, entry)
+
+def percentile_of(sorted_values, value):
+    """value 在有序数组中的分位 (0-100)，不足 20 个样本视为无效"""
+    if sorted_values is None or len(sorted_values) < 20: return None
+    if value is None or not np.isfinite(value) or value <= 0: return None
+    return float(np.searchsorted(sorted_values, value, side='right')) / len(sorted_values) * 100
+
+def _percentiles(entry):
+    res = {}
+    for f in FIELDS:
+        cur = entry["latest"].get(f)
+        for y in WINDOWS:
+            res[(f, y)] = percentile_of(entry["windows"].get(f, {}).get(y), cur)
+    return res
+
+def get_valuation_percentiles(ts_code, conn=None):
+    """
+    查询个股及其所在行业的 PE/PB 历史分位
+    返回 {"pe_ttm": {3: 12.3, 5: ..., 10: ...}, "pb": {...}, "industry": ..., "industry_pe_ttm": {...}, ...}
+    本地库无数据时各分位为 None
+    """
+    result = {f: {y: None for y in WINDOWS} for f in FIELDS}
+    result["industry"] = None
+    for f in FIELDS: result[f"industry_{f}"] = {y: None for y in WINDOWS}
+    if ts_code.endswith('.HK'): return result
+
+    own = conn is None
+    try:
+        if own: conn = get_store_conn(readonly=True)
+        if conn is None: return result
+        version = get_store_version(conn)
+
+        for (f, y), p in _percentiles(build_symbol_index(conn, ts_code, version)).items():
+            result[f][y] = p
+
+        industry = get_symbol_industry(conn, ts_code)
+        if industry:
+            result["industry"] = industry
+            for (f, y), p in _percentiles(build_industry_index(conn, industry, version)).items():
+                result[f"industry_{f}"][y] = p
+    except Exception as e:
+        print(f"Valuation Percentile Error: {e}")
+    finally:
+        if own and conn is not None: conn.close()
+    return result
+
+def format_percentile(p):
+    return f"{p:.1f}%" if p is not None else "N/A"